@@ -1,46 +1,17 @@
+from modules.profiler import profiler  # imported first so the startup report covers the imports too
 import tkinter as tk
 from tkinter import messagebox
-from PIL import Image, ImageTk
-import random
-from enum import Enum
+import time
 
+profiler.phase("import modules")
+from modules.clock import clock
 from modules.gif import GIFPlayer, QuizFrame
+from modules.image_pool import images
+from modules.quality import quality
+from modules.quiz_logic import Difficulty, QuizLogic
+from modules.telemetry import telemetry
 from modules.constants import *
 
-# === Difficulty Levels ===
-class Difficulty(Enum):
-    """Stores all difficulty settings in one place"""
-    # format: (level, color, background_path, min_number, max_number)
-    EASY = (0, "#58386c", HALLOW_GIF_PATH, 0, 9)  # single digit numbers
-    MEDIUM = (1, "#2596be", JUNGLE_GIF_PATH, 10, 99)  # two digit numbers
-    HARD = (2, "#896c57", CRIMSON_GIF_PATH, 1000, 9999)  # four digit numbers
-
-    @property
-    def level(self):
-        """Get the difficulty level number"""
-        return self.value[0]
-
-    @property
-    def color(self):
-        """Get the background color for this difficulty"""
-        return self.value[1]
-
-    @property
-    def path(self):
-        """Get the GIF path for this difficulty"""
-        return self.value[2]
-
-    @property
-    def min_val(self):
-        """Get minimum number for this difficulty"""
-        return self.value[3]
-
-    @property
-    def max_val(self):
-        """Get maximum number for this difficulty"""
-        return self.value[4]
-
-
 # === Quiz State Management ===
 class QuizContext:
     """Track quiz state throughout the application"""
@@ -51,7 +22,6 @@ class QuizContext:
         self.current_question = None  # stores (num1, num2, operation)
         self.attempts = 0  # number of attempts on current question
         self.time_remaining = QUIZ_DURATION  # seconds remaining for current question
-        self.timer_id = None  # reference to timer for cancellation
 
     def reset(self, new_difficulty=Difficulty.EASY):
         """Reset quiz state for a new game"""
@@ -65,71 +35,41 @@ class QuizContext:
 
 # create single context instance to hold all state
 Context = QuizContext()
-
-
-# === Quiz Logic Functions ===
-class QuizLogic:
-    """Contains all the math quiz logic (separated from UI)"""
-    
-    @staticmethod
-    def random_int(difficulty: Difficulty):
-        """Generate a random number based on difficulty level"""
-        return random.randint(difficulty.min_val, difficulty.max_val)
-
-    @staticmethod
-    def decide_operation():
-        """Randomly choose addition or subtraction"""
-        return random.choice(['+', '-'])
-
-    @staticmethod
-    def generate_problem(difficulty: Difficulty):
-        """Generate a new math problem with two numbers and an operation"""
-        num1 = QuizLogic.random_int(difficulty)
-        num2 = QuizLogic.random_int(difficulty)
-        op = QuizLogic.decide_operation()
-
-        # for subtraction, ensure result is positive (except in Hard mode)
-        if op == '-' and num1 < num2 and difficulty != Difficulty.HARD:
-            num1, num2 = num2, num1
-
-        return num1, num2, op
-
-    @staticmethod
-    def calculate_correct_answer(num1, num2, op):
-        """Calculate the correct answer for a problem"""
-        return num1 + num2 if op == '+' else num1 - num2
-
-    @staticmethod
-    def check_answer(num1, num2, op, user_answer):
-        """Check if the given answer is correct"""
-        return user_answer == QuizLogic.calculate_correct_answer(num1, num2, op)
+timer_telemetry = telemetry.channel("timer", interval=1)  # how steadily the countdown ticks
 
 
 # === Timer Functions ===
 def start_timer():
     """Start a 30-second countdown timer"""
     Context.time_remaining = QUIZ_DURATION  # reset the timer to 30 seconds
-    update_timer()  # begin the countdown
+    resume_timer()  # begin the countdown
+
+def resume_timer():
+    """Continue the countdown from the time that is left"""
+    stop_timer()  # never run two countdowns at once
+    timer_telemetry.start()
+    # the shared clock calls update_timer every second
+    clock.every(1, update_timer, group=TIMER_GROUP)
 
 def update_timer():
     """Update timer display and check if time is up"""
+    timer_telemetry.tick()
     if Context.time_remaining >= 0:
+        start = time.perf_counter()
         # change color to red when 10 seconds or less remain
         timer_label.config(
             text=f"TIME: {Context.time_remaining}s",
             fg="#FF0000" if Context.time_remaining <= 10 else "#FFA500"
         )
+        timer_telemetry.draw(time.perf_counter() - start)
         Context.time_remaining -= 1
-        # update every second by calling the function after 1 second
-        Context.timer_id = root.after(1000, update_timer)
     else:
         time_up()  # if timer hits 0, time-out
+        return False  # stop the countdown
 
 def stop_timer():
     """Stop the countdown timer"""
-    if Context.timer_id:
-        root.after_cancel(Context.timer_id)
-        Context.timer_id = None
+    clock.unsubscribe_group(TIMER_GROUP)
 
 def time_up():
     """Handle when timer reaches zero"""
@@ -182,7 +122,7 @@ def check_answer():
         user_answer = int(answer_entry.get())
     except ValueError:
         feedback_label.config(text="ENTER A VALID NUMBER!", fg="red")
-        update_timer()  # restart timer because this wasn't a real attempt
+        resume_timer()  # restart timer because this wasn't a real attempt
         return
 
     num1, num2, op = Context.current_question
@@ -253,6 +193,9 @@ def start_quiz_with_difficulty(diff):
     # switch to quiz screen
     show_frame(quiz_frame)
 
+    # the choice is made, so stop warming up the other backgrounds
+    QuizFrame.cancel_prefetch(keep=diff)
+
     # get or create the background for this difficulty and show it
     QuizFrame.get_or_create(quiz_frame, diff).start()
 
@@ -303,7 +246,7 @@ def display_results():
 def show_frame(frame):
     """Switch to a different screen (menu, difficulty, or quiz)"""
     # stop all GIF animations
-    GIFPlayer.stop_all()
+    clock.unsubscribe_group(GIF_GROUP)
     
     # show the requested frame
     frame.tkraise()
@@ -311,15 +254,24 @@ def show_frame(frame):
     # start the GIF that belongs to the screen we are switching to
     if frame == menu_frame:
         menu_gif.play()
+        QuizFrame.cancel_prefetch()  # left the difficulty screen, no need to keep warming up
     elif frame == diff_frame:
         diff_gif.play()
+        # decode the start of each quiz background while the user picks, so the quiz shows instantly
+        for diff in Difficulty:
+            QuizFrame.prefetch(quiz_frame, diff)
 
 
 # === App ===
 # create main window
+profiler.phase("window")
 root = tk.Tk()
 root.title("Maths Quiz")
 root.geometry(f"{WINDOW_WIDTH}x{WINDOW_HEIGHT}")
+clock.attach(root)  # every animation and the countdown tick through this one clock
+telemetry.attach(root)  # F3 shows frame timings
+profiler.phase("calibrate quality")
+quality.calibrate(MENU_GIF_PATH, (WINDOW_WIDTH, WINDOW_HEIGHT))  # pick a resize quality this computer can keep up with
 
 # create three main frames (screens)
 menu_frame = tk.Frame(root, bg="black")
@@ -332,13 +284,14 @@ for f in (menu_frame, diff_frame, quiz_frame):
 
 
 # === Menu Frame ===
+profiler.phase("menu screen")
 # create a label to hold background GIF
 menu_bg = tk.Label(menu_frame)
 menu_bg.pack(fill="both", expand=True)  # make it fill the whole menu area
 menu_gif = GIFPlayer(menu_bg, MENU_GIF_PATH, WINDOW_WIDTH, WINDOW_HEIGHT)
 
 # --- Start button ---
-start_img = ImageTk.PhotoImage(Image.open(START_IMG_PATH).resize((280, 55), Image.LANCZOS))
+start_img = images.load(START_IMG_PATH, MENU_BUTTON_SIZE)
 start_button = tk.Label(menu_frame, image=start_img, bg="black", cursor="hand2")  # create a label to act as a clickable Start button
 start_button.image = start_img  # keep a reference so the image doesn't disappear
 
@@ -347,7 +300,7 @@ start_button.bind("<Button-1>", lambda e: show_frame(diff_frame))
 start_button.place(relx=0.5, rely=0.59, anchor="center")
 
 # --- Quit button ---
-quit_img = ImageTk.PhotoImage(Image.open(QUIT_IMG_PATH).resize((280, 55), Image.LANCZOS))
+quit_img = images.load(QUIT_IMG_PATH, MENU_BUTTON_SIZE)
 quit_button = tk.Label(menu_frame, image=quit_img, bg="black", cursor="hand2")  # clickable label
 quit_button.image = quit_img  # keep a reference so the image doesn't disappear
 quit_button.bind("<Button-1>", lambda e: root.quit())  # when clicked, exit application
@@ -355,6 +308,7 @@ quit_button.place(relx=0.5, rely=0.75, anchor="center")
 
 
 # === Difficulty Frame ===
+profiler.phase("difficulty screen")
 # create the label that holds the background GIF
 diff_bg = tk.Label(diff_frame)
 diff_bg.pack(fill="both", expand=True)  # fill entire menu screen
@@ -373,7 +327,7 @@ for i, (text, y, diff) in enumerate([
     btn.place(x=450, y=y)
 
 # --- Back button ---
-back_img = ImageTk.PhotoImage(Image.open(BACK_IMG_PATH).resize((280, 55), Image.LANCZOS))
+back_img = images.load(BACK_IMG_PATH, MENU_BUTTON_SIZE)
 back_button = tk.Label(diff_frame, image=back_img, bg="black", cursor="hand2")  # create a label that works like a clickable Back button
 back_button.image = back_img  # keep a reference so the image doesn't disappear
 back_button.bind("<Button-1>", lambda e: show_frame(menu_frame))
@@ -381,9 +335,10 @@ back_button.place(relx=0.5, rely=0.93, anchor="center")
 
 
 # === Quiz Frame ===
+profiler.phase("quiz screen")
 
 # --- Back button (returns to diff menu) ---
-quiz_back_img = ImageTk.PhotoImage(Image.open(BACK_IMG_PATH).resize((150, 40), Image.LANCZOS))
+quiz_back_img = images.load(BACK_IMG_PATH, BACK_BUTTON_SIZE)  # back_btn.png is only decoded once
 quiz_back_button = tk.Label(quiz_frame, image=quiz_back_img, bg="black", cursor="hand2")  # create a label that acts as a Back button in the quiz screen
 quiz_back_button.image = quiz_back_img  # keep a reference so the image doesn't disappear
 quiz_back_button.bind("<Button-1>", lambda e: (stop_timer(), show_frame(diff_frame)))  # stop timer when clicked and return to diff menu
@@ -429,5 +384,7 @@ score_label.place(relx=0.5, y=455, anchor="center")
 
 
 # start the application on the menu screen
+profiler.phase("first draw")
 show_frame(menu_frame)
+root.after_idle(profiler.finish)  # startup is over once Tk has drawn the window and gone idle
 root.mainloop()
\ No newline at end of file
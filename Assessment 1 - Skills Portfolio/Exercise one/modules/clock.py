@@ -0,0 +1,116 @@
+import math
+import time
+import traceback
+
+from modules.constants import CLOCK_SLACK
+
+
+class Subscription:
+    """One thing (animation, countdown...) that the clock calls back"""
+
+    def __init__(self, clock, callback, due, interval, group):
+        self.clock = clock
+        self.callback = callback
+        self.due = due  # time.monotonic() of the next call
+        self.interval = interval  # seconds between calls, or None if the callback picks its own times
+        self.group = group  # name used to cancel related subscriptions together
+
+    @property
+    def active(self):
+        """Whether the clock will still call this subscription"""
+        return self in self.clock.subscribers
+
+    def cancel(self):
+        """Stop receiving ticks"""
+        self.clock.unsubscribe(self)
+
+
+class Clock:
+    """A single tick driver shared by every animation, countdown and typewriter"""
+
+    def __init__(self):
+        self.widget = None  # any Tk widget, used to schedule ticks with after()
+        self.subscribers = []  # everything currently waiting for a tick
+        self.job = None  # the one scheduled after() call
+        self.ticking = False  # True while subscribers are being called
+
+    def attach(self, widget):
+        """Use this widget's event loop for ticks (call once, after creating the root window)"""
+        self.widget = widget
+        self._reschedule()
+
+    def subscribe(self, callback, delay=0, group=None):
+        """Call callback(now) after delay seconds.
+
+        The callback returns the time.monotonic() it wants to be called again, or None to stop.
+        """
+        return self._add(Subscription(self, callback, time.monotonic() + delay, None, group))
+
+    def every(self, interval, callback, delay=0, group=None):
+        """Call callback() every interval seconds until it returns False"""
+        return self._add(Subscription(self, callback, time.monotonic() + delay, interval, group))
+
+    def unsubscribe(self, subscription):
+        """Stop calling a subscription (does nothing if it already stopped)"""
+        if subscription in self.subscribers:
+            self.subscribers.remove(subscription)
+            self._reschedule()
+
+    def unsubscribe_group(self, group):
+        """Stop every subscription in a group (e.g. all GIFs)"""
+        self.subscribers = [sub for sub in self.subscribers if sub.group != group]
+        self._reschedule()
+
+    def _add(self, subscription):
+        self.subscribers.append(subscription)
+        self._reschedule()
+        return subscription
+
+    def _reschedule(self):
+        """Schedule the next tick for whichever subscriber is due first"""
+        if self.widget is None or self.ticking:
+            return  # not attached yet, or _tick will reschedule when it's done
+        if self.job:
+            self.widget.after_cancel(self.job)
+            self.job = None
+        if not self.subscribers:
+            return  # nothing to do, so sleep until someone subscribes
+        wait = min(sub.due for sub in self.subscribers) - time.monotonic()
+        self.job = self.widget.after(max(0, math.ceil(wait * 1000)), self._tick)
+
+    def _tick(self):
+        """Call every subscriber that is due in one batch"""
+        self.job = None
+        self.ticking = True
+        try:
+            now = time.monotonic()
+            # anything due very soon runs now too, so close deadlines share a tick
+            for sub in [sub for sub in self.subscribers if sub.due <= now + CLOCK_SLACK]:
+                if not sub.active:
+                    continue  # cancelled by an earlier callback in this tick
+                try:
+                    result = sub.callback(now) if sub.interval is None else sub.callback()
+                except Exception:
+                    traceback.print_exc()  # same as Tk does for its own callbacks
+                    if sub.active:
+                        # drop it, otherwise it stays due and fails again on every tick
+                        self.subscribers.remove(sub)
+                    continue
+                if not sub.active:
+                    continue  # the callback cancelled itself
+                if sub.interval is None:
+                    next_due = result
+                else:
+                    # count from when it was due (not from now) so it doesn't drift
+                    next_due = None if result is False else sub.due + sub.interval
+                if next_due is None:
+                    self.subscribers.remove(sub)
+                else:
+                    sub.due = next_due
+        finally:
+            self.ticking = False
+            self._reschedule()
+
+
+# the clock used by the whole app
+clock = Clock()
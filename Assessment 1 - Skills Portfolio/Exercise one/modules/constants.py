@@ -15,9 +15,53 @@ CRIMSON_GIF_PATH = os.path.join(BASE_DIR, "media", "crimson_wp.gif")
 START_IMG_PATH = os.path.join(BASE_DIR, "media", "start_btn.png")
 QUIT_IMG_PATH = os.path.join(BASE_DIR, "media", "quit_btn.png")
 BACK_IMG_PATH = os.path.join(BASE_DIR, "media", "back_btn.png")
+BUNDLE_PATH = os.path.join(BASE_DIR, "media", "assets.bundle")  # built by python -m modules.bundle
 
 # === Settings ===
 WINDOW_WIDTH = 960
 WINDOW_HEIGHT = 540
 QUIZ_DURATION = 30  # seconds for each question
-TOTAL_QUESTIONS = 10  # number of questions per quiz
\ No newline at end of file
+TOTAL_QUESTIONS = 10  # number of questions per quiz
+MENU_BUTTON_SIZE = (280, 55)  # start / quit / difficulty buttons
+BACK_BUTTON_SIZE = (150, 40)  # back button on the quiz screen
+QUIZ_CACHE_BUDGET = 64 * 1024 * 1024  # bytes of background frames kept for visited difficulties
+GIF_WINDOW_SIZE = 12  # frames kept in memory when a GIF is streamed
+GIF_STREAM_THRESHOLD = 256 * 1024 * 1024  # bytes of frames (a byte a pixel) before a GIF is streamed instead
+GIF_LOADER_WORKERS = min(4, os.cpu_count() or 1)  # threads that resize GIF frames in the background
+GIF_POLL_INTERVAL = 15  # ms between checks for newly decoded frames
+GIF_CONVERT_BATCH = 4  # frames turned into PhotoImages per check while a GIF is loading
+GIF_PREFETCH_NICENESS = 10  # how much lower the prefetch thread's priority is (Linux)
+QUALITY_FRAME_BUDGET = 0.02  # seconds of resizing one loader thread may spend per frame (on average)
+QUALITY_COOLDOWN = 50  # resized frames to wait after dropping quality before it can drop again
+GIF_DEFAULT_DURATION = 100  # ms per frame when a GIF doesn't say (or asks for too fast a speed)
+GIF_MIN_DURATION = 20  # shortest frame delay (ms) that is taken as given
+SHARED_FRAMES = False  # opt in: share resized frames with other apps running on this computer (held in RAM until the last app exits)
+SHARED_FRAMES_CHUNK = 16  # frames in each shared memory block (about 8 MB at the window size)
+SHARED_FRAMES_VERSION = 3  # bump when the shared frame layout changes
+TELEMETRY_SAMPLES = 600  # timings kept per channel for the percentiles
+TELEMETRY_LATE = 0.016  # seconds behind schedule (one 60 Hz frame) before a tick counts as late
+TELEMETRY_HUD_KEY = "<F3>"  # shows / hides the timing overlay
+TELEMETRY_HUD_INTERVAL = 0.5  # seconds between overlay updates
+TELEMETRY_DUMP_INTERVAL = 5  # seconds between JSON dumps (with --telemetry=path)
+
+# === Clock ===
+CLOCK_SLACK = 0.004  # seconds; subscribers due this close together share one tick
+GIF_GROUP = "gif"  # clock group for background animations
+TIMER_GROUP = "timer"  # clock group for the question countdown
+TELEMETRY_GROUP = "telemetry"  # clock group for the timing overlay and dumps
+
+# === Asset Bundle ===
+BUNDLE_VERSION = 2  # bump when the bundle layout changes, so old bundles get rebuilt
+BUNDLE_LOCK_TIMEOUT = 600  # seconds before a leftover build lock is treated as abandoned
+# every GIF and the size it is shown at
+BUNDLE_GIFS = {
+    path: (WINDOW_WIDTH, WINDOW_HEIGHT)
+    for path in (MENU_GIF_PATH, DIFF_GIF_PATH, HALLOW_GIF_PATH, JUNGLE_GIF_PATH, CRIMSON_GIF_PATH)
+}
+# every button image: (path, size, whether a grayscale version is needed too)
+BUNDLE_IMAGES = [
+    (START_IMG_PATH, MENU_BUTTON_SIZE, False),
+    (QUIT_IMG_PATH, MENU_BUTTON_SIZE, False),
+    (BACK_IMG_PATH, MENU_BUTTON_SIZE, False),
+    (BACK_IMG_PATH, BACK_BUTTON_SIZE, False),
+]
\ No newline at end of file
@@ -1,62 +1,364 @@
-from PIL import Image, ImageTk, ImageSequence
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageTk
+import os
+import queue
+import threading
+import time
 import tkinter as tk
 
+from modules.bundle import bundle
+from modules.clock import clock
 from modules.constants import *
+from modules.image_pool import image_key, images
+from modules.quality import palette_of, quality, zoom
+from modules.shared_frames import SharedFrames
+from modules.telemetry import telemetry
+
+# worker threads that resize GIF frames in the background (each GIF's frames are decoded in
+# order on a thread of its own, and only the PhotoImage conversion happens on the Tk thread)
+_loader = ThreadPoolExecutor(max_workers=GIF_LOADER_WORKERS, thread_name_prefix="gif-loader")
+
+
+def _lower_priority():
+    """Run the current worker thread at low priority, so prefetching never slows the app down"""
+    try:
+        # on Linux every thread has its own priority
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), GIF_PREFETCH_NICENESS)
+    except (AttributeError, OSError):
+        pass  # not supported here (e.g. Windows), it still only uses one thread
+
+
+# a single low priority thread that resizes frames for GIFs warming up before they are needed
+_prefetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gif-prefetch", initializer=_lower_priority)
+
+
+class FrameWindow:
+    """Decodes GIF frames in the background and keeps a window of them in memory.
+
+    Frames are kept as palette images (one byte a pixel plus the GIF's palette); GIFPlayer
+    only expands the frame it is showing to full colour.
+    """
+
+    def __init__(self, gif_path, width, height, size=None, shared=False):
+        self.size = (width, height)
+        # frames that were resized ahead of time in the asset bundle (None if it isn't there)
+        self.bundled = bundle.frames(gif_path, self.size) if bundle else None
+        if self.bundled:
+            self.image = None  # nothing to decode
+            self.palette = None  # or to map onto a palette
+            self.count = len(self.bundled["frames"])
+            self.shared = None  # reading the bundle is already as cheap as shared memory
+        else:
+            self.image = Image.open(gif_path)  # keep the file open so frames can be decoded later
+            self.count = getattr(self.image, "n_frames", 1)  # total number of frames in the GIF
+            self.palette = palette_of(self.image)  # resized frames are mapped back onto the GIF's colours
+            # frames other apps on this computer already decoded (None when not sharing)
+            self.shared = SharedFrames.open(gif_path, self.count, width, height) if shared else None
+        # how many frames are allowed to stay in memory (None keeps every frame)
+        self.capacity = self.count if size is None else max(1, min(size, self.count))
+        self.frames = OrderedDict()  # frame index -> palette image (least recently used first)
+        self.durations = [None] * self.count  # how long each frame is shown (filled in as frames load)
+        self.pending = set()  # frames that have been asked for but haven't arrived yet
+        self.ready = queue.Queue()  # resized frames handed back from the worker threads
+        self._wanted = deque()  # frames waiting to be decoded, in order
+        self._lock = threading.Lock()  # guards _wanted and _decoding
+        self._decoding = False  # whether a worker is currently decoding this GIF
+        # decoded frames waiting to be resized, capped so decoding can't run far ahead of it
+        self._queued = threading.Semaphore(GIF_LOADER_WORKERS * 2)
+        self.executor = _loader  # which workers the resizing runs on
+        self._generation = 0  # goes up on cancel(), so work queued before it gets thrown away
+        images.holders.add(self)  # the pool counts the frames shared between windows
+
+    def __len__(self):
+        return self.count
+
+    def duration(self, index):
+        """How long a frame should stay on screen, in seconds"""
+        ms = self.durations[index]
+        if not ms or ms < GIF_MIN_DURATION:
+            ms = GIF_DEFAULT_DURATION  # unknown or too fast, same as web browsers do
+        return ms / 1000
+
+    def get(self, index):
+        """Get a frame if it has been decoded already, otherwise ask for it and return None"""
+        self.receive()
+        frame = self.frames.get(index)
+        if frame is None:
+            self.request([index])
+        else:
+            self.frames.move_to_end(index)  # mark as most recently used
+        return frame
+
+    def prefetch(self, index):
+        """Ask for the frames coming up after index so they are ready in time"""
+        # wrap around like the animation does
+        self.request([(index + offset) % self.count for offset in range(1, self.capacity)])
+
+    def request(self, indexes, low_priority=False):
+        """Queue frames for decoding on a worker thread"""
+        indexes = [i for i in indexes if i not in self.frames and i not in self.pending]
+        self.pending.update(indexes)
+        with self._lock:
+            self._wanted.extend(indexes)
+            if not low_priority:
+                # something is waiting for these (even if a prefetch already asked), so go full speed
+                self.executor = _loader
+            elif not self._decoding:
+                self.executor = _prefetcher
+            if self._decoding or not self._wanted:
+                return  # the running worker picks them up (or there is nothing to decode)
+            self._decoding = True
+            self._start_decoding(self.executor)
+
+    def cancel(self):
+        """Forget every frame that was asked for but hasn't arrived yet"""
+        with self._lock:
+            self._wanted.clear()
+            self._generation += 1  # frames already being resized will be dropped
+        self.pending.clear()  # so they can be asked for again later
+
+    def receive(self, limit=None):
+        """Collect resized frames from the workers (runs on the Tk thread)"""
+        while limit is None or limit > 0:
+            try:
+                index, resized, duration, key = self.ready.get_nowait()
+            except queue.Empty:
+                break
+            if index not in self.pending:
+                continue  # arrived after being cancelled
+            self.pending.discard(index)
+            self.durations[index] = duration
+            # identical frames (common in looping wallpapers) share one image
+            self.frames[index] = images.share(resized, key)
+            if len(self.frames) > self.capacity:
+                self.frames.popitem(last=False)  # evict the least recently used frame
+            if limit is not None:
+                limit -= 1
+
+    def memory(self):
+        """Bytes used by the frames currently in the window"""
+        unique = {id(frame): frame for frame in self.frames.values()}  # shared frames only count once
+        # one byte per pixel, plus 768 bytes of palette
+        return sum(frame.width * frame.height + 768 for frame in unique.values())
+
+    def close(self):
+        """Drop every frame and stop decoding any more"""
+        self.cancel()
+        self.frames.clear()
+
+    def _start_decoding(self, executor):
+        """Start a thread that decodes the wanted frames and has executor resize them"""
+        # the decoding gets a thread of its own, so resizing can start on the first frame
+        # instead of waiting behind the whole decode loop in the same pool
+        name = "gif-prefetch-decode" if executor is _prefetcher else "gif-decode"
+        threading.Thread(target=self._decode, args=(executor,), name=name, daemon=True).start()
+
+    def _decode(self, executor):
+        """Decode wanted frames one after another (runs on its own thread)"""
+        if executor is _prefetcher:
+            _lower_priority()  # warming up, so stay out of the way like the prefetch workers
+        # GIF frames build on each other, so decoding has to go in order on one thread
+        while True:
+            with self._lock:
+                if not self._wanted:
+                    self._decoding = False
+                    return
+                if self.executor is not executor:
+                    # something is waiting now, so carry on from a full speed thread
+                    self._start_decoding(self.executor)
+                    return
+                index = self._wanted.popleft()
+                generation = self._generation
+            if self.bundled:
+                # already decoded and resized, just wrap the bundled pixels
+                self.ready.put((index, *bundle.frame(self.bundled, index)))
+                continue
+            stored = self.shared.get(index, quality.tier) if self.shared else None
+            if stored:
+                # another app already resized this frame, so just use theirs
+                image, duration = stored
+                self.ready.put((index, image, duration, image_key(image)))
+                continue
+            self.image.seek(index)
+            duration = self.image.info.get("duration")  # each frame stores its own delay in ms
+            # resizing is the slow part, so it is spread over the workers
+            self._queued.acquire()
+            try:
+                self.executor.submit(self._resize, index, self.image.copy(), duration, generation)
+            except RuntimeError:
+                return  # the app is exiting and the workers have shut down
+
+    def _resize(self, index, frame, duration, generation):
+        """Resize a decoded frame and hand it back to the Tk thread"""
+        try:
+            if generation != self._generation:
+                return  # cancelled while it was waiting
+            # the quality tier picks the filter (LANCZOS looks best, others are faster on slow computers)
+            tier = quality.tier
+            start = time.perf_counter()
+            resized = tier.resize(frame, self.size, self.palette)
+            quality.record(tier, time.perf_counter() - start)  # drop to a cheaper tier if resizing can't keep up
+            if self.shared:
+                self.shared.put(index, resized, duration, tier)  # let other apps skip this work
+            # the pixel fingerprint is worked out here so the Tk thread doesn't have to
+            self.ready.put((index, resized, duration, image_key(resized)))
+        finally:
+            self._queued.release()  # let the decode loop hand over another frame
 
 
 class GIFPlayer:
     """Handles animated GIF playback on a label"""
-    # track all GIF instances in the application
-    _all_gifs = []
 
-    def __init__(self, label, gif_path, width, height):
+    def __init__(self, label, gif_path, width, height, stream=None, window=GIF_WINDOW_SIZE, shared=SHARED_FRAMES,
+                 preload=True):
         self.label = label  # where the GIF will be shown
-        self.frames = []  # store all frames of the GIF
+        self.window = window  # frames kept in memory when streaming, and how many prefetch() warms up
         self.current_frame = 0
-        self.job = None  # in order to stop the animation later
+        self.deadline = None  # time.monotonic() when the current frame is due
+        self.waiting = False  # whether the last tick found its frame still decoding
+        self.job = None  # clock subscription, in order to stop the animation later
+        self.load_job = None  # collects frames while the whole GIF is loading
+        self.photo = None  # the one PhotoImage every frame is drawn into
+        self.small = None  # frames from the half size tier are drawn here, then zoomed into zoomed
+        self.zoomed = None
+        self.telemetry = telemetry.channel("gif " + os.path.basename(gif_path))  # frame timing stats
 
-        # open the GIF file
-        im = Image.open(gif_path)
-        for frame in ImageSequence.Iterator(im):  # go through each frame in GIF
-            resized = frame.copy().resize((width, height), Image.LANCZOS)  # LANCZOS from pillow for best quality
-            self.frames.append(ImageTk.PhotoImage(resized))  # resized the frame and convert it so Tkinter can show it
+        self.frames = FrameWindow(gif_path, width, height, shared=shared)
+        if stream is None:
+            # only stream GIFs whose frames (a byte a pixel) would take too much memory all together
+            stream = len(self.frames) * width * height > GIF_STREAM_THRESHOLD
+        self.stream = stream  # decode frames while playing instead of keeping every one
+        if stream:
+            # only a small window of frames is kept, so memory doesn't grow with GIF length
+            self.frames.capacity = max(1, min(window, len(self.frames)))
+        elif preload:
+            self.load_all()  # otherwise it starts from prefetch() or play()
 
-        # add this GIF to the list of all GIFs
-        GIFPlayer._all_gifs.append(self)
+    def load_all(self):
+        """Decode every frame in the background (frame 0 first), keeping them all"""
+        self.frames.request(range(len(self.frames)))
+        if not self.load_job:
+            self.load_job = clock.subscribe(self.load)  # turn them into PhotoImages as they arrive
+
+    def load(self, now):
+        """Keep converting frames as they finish loading, a few at a time"""
+        self.frames.receive(GIF_CONVERT_BATCH)
+        if not self.frames.pending:
+            self.load_job = None
+            return None  # everything is loaded
+        return now + GIF_POLL_INTERVAL / 1000
 
     def play(self):
         """Start playing the GIF from the beginning"""
         self.stop()
+        if not self.stream:
+            self.load_all()  # nothing left to do once loaded, otherwise a prefetch goes full speed
         self.current_frame = 0
-        self.animate()  # begin loop
-
-    def animate(self):
-        """Show next frame"""
-        if self.frames:
-            self.label.config(image=self.frames[self.current_frame])  # update the label image
-            self.label.image = self.frames[self.current_frame]
-            # move to next frame (loop back to 0 when done)
+        self.deadline = time.monotonic()
+        self.waiting = False
+        self.telemetry.start()
+        self.job = clock.subscribe(self.animate, group=GIF_GROUP)  # begin loop
+
+    def animate(self, now):
+        """Show the frame that is due now, skipping any we are too late for"""
+        if self.waiting:
+            # waiting for a frame to decode isn't being late, so its time starts when it shows
+            self.deadline = now
+        else:
+            self.telemetry.drop(self.catch_up(now))
+
+        frame = self.frames.get(self.current_frame)
+        self.waiting = frame is None
+        if frame is None:
+            # frame is still being decoded, check again shortly
+            self.telemetry.stall()
+            return now + GIF_POLL_INTERVAL / 1000
+
+        self.telemetry.tick(self.deadline)  # when this frame was meant to appear
+        drawn = time.perf_counter()
+        self.draw(frame)
+        self.telemetry.draw(time.perf_counter() - drawn)
+        if self.stream:
+            self.frames.prefetch(self.current_frame)  # get the upcoming frames ready
+
+        # plan the next frame from when this one was due (not from now), so delays don't add up
+        self.deadline += self.frames.duration(self.current_frame)
+        # move to next frame (loop back to 0 when done)
+        self.current_frame = (self.current_frame + 1) % len(self.frames)
+        return self.deadline  # when the clock should call us again
+
+    def draw(self, frame):
+        """Expand a palette frame to full colour and paint it into the label's image"""
+        rgb = frame.convert("RGB")  # only the frame on screen is ever stored as RGB
+        if rgb.width < self.frames.size[0]:
+            # resized at a smaller size, so Tk scales it up
+            self.small = self.paste(self.small, rgb)
+            self.zoomed = zoom(self.small, self.frames.size[0] // rgb.width, into=self.zoomed)
+            photo = self.zoomed
+        else:
+            photo = self.photo = self.paste(self.photo, rgb)
+        if getattr(self.label, "image", None) is not photo:
+            self.label.config(image=photo)  # after this, pasting a new frame updates the label by itself
+            self.label.image = photo
+
+    @staticmethod
+    def paste(photo, image):
+        """Paint image into photo, only making a new PhotoImage when there isn't one the right size"""
+        if photo is None or (photo.width(), photo.height()) != image.size:
+            return ImageTk.PhotoImage(image)
+        photo.paste(image)
+        return photo
+
+    def catch_up(self, now):
+        """Skip frames whose time has already passed when the app falls behind (returns how many)"""
+        for skipped in range(len(self.frames)):
+            duration = self.frames.duration(self.current_frame)
+            if now < self.deadline + duration:
+                return skipped  # the current frame is still on time
+            self.deadline += duration
             self.current_frame = (self.current_frame + 1) % len(self.frames)
-            # show next frame in 40ms
-            self.job = self.label.after(40, self.animate)
+        # behind by a whole loop of the GIF, just carry on from now
+        self.deadline = now
+        return len(self.frames)
 
     def stop(self):
         """Stop the animation"""
         if self.job:  # check if an animation is running
-            self.label.after_cancel(self.job)
+            self.job.cancel()
             self.job = None
 
-    @classmethod
-    def stop_all(cls):
-        """Stop all GIF animations in the application"""
-        for gif in cls._all_gifs:
-            gif.stop()
+    def prefetch(self):
+        """Start decoding the first frames at low priority, before the GIF is needed"""
+        self.frames.request(range(min(self.window, len(self.frames))), low_priority=True)
+        if not self.load_job:
+            self.load_job = clock.subscribe(self.load)  # turn them into PhotoImages as they arrive
+
+    def cancel_prefetch(self):
+        """Stop decoding frames that were only prefetched"""
+        self.frames.cancel()
+
+    def memory(self):
+        """Bytes of frame memory this GIF is using"""
+        photos = [photo for photo in (self.photo, self.small, self.zoomed) if photo]
+        return self.frames.memory() + sum(photo.width() * photo.height() * 4 for photo in photos)  # Tk uses 4 bytes per pixel
+
+    def close(self):
+        """Stop the GIF and free its frames (it can't be played again)"""
+        self.stop()
+        if self.load_job:
+            self.load_job.cancel()
+            self.load_job = None
+        self.frames.close()
+        self.photo = self.small = self.zoomed = None
 
 
 class QuizFrame:
     """Manages background GIF for each difficulty level"""
-    # cache to store already created frames (so we don't recreate them)
-    _cache = {}
+    # cache to store already created frames (so we don't recreate them), least recently used first
+    _cache = OrderedDict()
+    # most frame memory (bytes) the cache may hold; older difficulties are dropped past this
+    budget = QUIZ_CACHE_BUDGET
 
     def __init__(self, parent, diff):
         # create a label to hold background GIF
@@ -66,16 +368,60 @@ class QuizFrame:
         # store the background color for labels in this difficulty
         self.label_bg = diff.color
         
-        # create the GIF player for this difficulty's background
-        self.gif = GIFPlayer(self.bg, diff.path, WINDOW_WIDTH, WINDOW_HEIGHT)
+        # create the GIF player for this difficulty's background (it loads once prefetched or played)
+        self.gif = GIFPlayer(self.bg, diff.path, WINDOW_WIDTH, WINDOW_HEIGHT, preload=False)
 
     @classmethod
     def get_or_create(cls, parent, diff):
         """Get existing frame from cache or create new one if it doesn't exist"""
-        if diff not in cls._cache:
+        if diff in cls._cache:
+            cls._cache.move_to_end(diff)  # mark as most recently used
+        else:
             cls._cache[diff] = cls(parent, diff)
+        cls.evict(keep=diff)
         return cls._cache[diff]
 
+    @classmethod
+    def prefetch(cls, parent, diff):
+        """Start warming up a difficulty's background in the background, before it's picked"""
+        if diff not in cls._cache:
+            if cls.memory_used() >= cls.budget:
+                return  # no room to warm up another difficulty
+            cls._cache[diff] = cls(parent, diff)
+            cls._cache.move_to_end(diff, last=False)  # not used yet, so it's the first to be evicted
+        cls._cache[diff].gif.prefetch()
+
+    @classmethod
+    def cancel_prefetch(cls, keep=None):
+        """Stop warming up backgrounds, except keep (frames that are already decoded are kept)"""
+        for diff, frame in cls._cache.items():
+            if diff != keep:
+                frame.gif.cancel_prefetch()
+
+    @classmethod
+    def evict(cls, keep=None):
+        """Drop least recently used difficulties until the cache fits in its budget"""
+        for diff in list(cls._cache):
+            if cls.memory_used() <= cls.budget:
+                break
+            if diff != keep:  # never drop the one being shown
+                cls._cache.pop(diff).destroy()
+
+    @classmethod
+    def memory_usage(cls):
+        """Bytes of frame memory held by each cached difficulty"""
+        return {diff: frame.gif.memory() for diff, frame in cls._cache.items()}
+
+    @classmethod
+    def memory_used(cls):
+        """Total bytes of frame memory held by the cache"""
+        return sum(cls.memory_usage().values())
+
+    def destroy(self):
+        """Free this difficulty's frames and remove its background label"""
+        self.gif.close()
+        self.bg.destroy()
+
     def play(self):
         """Start playing this frame's background GIF"""
         self.gif.play()
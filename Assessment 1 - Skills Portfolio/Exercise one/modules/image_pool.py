@@ -0,0 +1,97 @@
+from collections import Counter
+from PIL import Image, ImageTk
+import hashlib
+import weakref
+
+from modules.bundle import bundle
+
+
+def image_key(image):
+    """Fingerprint of an image's pixels (safe to call from a worker thread)"""
+    digest = hashlib.blake2b(image.tobytes(), digest_size=16)
+    if image.mode == "P":
+        digest.update(bytes(image.getpalette()))  # same indices with other colours is a different image
+    return image.mode, image.size, digest.digest()
+
+
+class ImagePool:
+    """Shares one PhotoImage between identical frames and repeated image loads"""
+
+    def __init__(self):
+        # pixel fingerprint -> PhotoImage; weak, so frames a GIF has let go of can still be freed
+        self.photos = weakref.WeakValueDictionary()
+        self.frames = weakref.WeakValueDictionary()  # pixel fingerprint -> compact (palette) GIF frame
+        self.files = {}  # (path, size) -> PhotoImage for images loaded from a file
+        self.sources = {}  # path -> decoded image file, so each file is only decoded once
+        self.resized = {}  # (path, size) -> resized PIL image
+        self.handouts = Counter()  # pixel fingerprint -> how many times its PhotoImage was handed out
+        self.holders = weakref.WeakSet()  # GIF frame windows, whose frames came from share()
+
+    def photo(self, image, key=None):
+        """Get a PhotoImage for a PIL image, reusing one with exactly the same pixels if it exists"""
+        key = key or image_key(image)
+        photo = self.photos.get(key)
+        if photo is None:
+            photo = ImageTk.PhotoImage(image)
+            self.photos[key] = photo
+            self.handouts[key] = 0  # an older PhotoImage with these pixels may have been freed
+        self.handouts[key] += 1
+        return photo
+
+    def share(self, image, key=None):
+        """Get one shared copy of a PIL image, so identical GIF frames are only stored once"""
+        key = key or image_key(image)
+        shared = self.frames.get(key)
+        if shared is None:
+            self.frames[key] = shared = image
+        return shared
+
+    def open(self, path, size):
+        """Open an image file resized to size (each file is decoded once, each size resized once)"""
+        if (path, size) not in self.resized:
+            bundled = bundle.image(path, size) if bundle else None
+            if bundled:
+                self.resized[(path, size)] = bundled  # already resized when the bundle was built
+                return bundled
+            if path not in self.sources:
+                self.sources[path] = Image.open(path)
+                self.sources[path].load()
+            self.resized[(path, size)] = self.sources[path].resize(size, Image.LANCZOS)
+        return self.resized[(path, size)]
+
+    def load(self, path, size):
+        """Get a PhotoImage of an image file resized to size, reusing it if it was loaded before"""
+        # open() gives back the same resized image, so photo() finds the PhotoImage made the first time
+        photo = self.photo(self.open(path, size))
+        self.files[(path, size)] = photo  # kept for the whole run, like the widgets showing it
+        return photo
+
+    def savings(self):
+        """How many images in use right now are reused ones, and the bytes that saves"""
+        reused = saved = 0
+        # PhotoImages handed out more than once (photos only holds the ones still alive)
+        for key, photo in list(self.photos.items()):
+            extra = self.handouts[key] - 1
+            reused += extra
+            saved += extra * photo.width() * photo.height() * 4  # Tk keeps 4 bytes per pixel
+        # GIF frames standing in for other identical frames the windows hold right now
+        held = Counter()
+        frames = {}
+        for window in list(self.holders):
+            for frame in window.frames.values():
+                held[id(frame)] += 1
+                frames[id(frame)] = frame
+        for ident, count in held.items():
+            frame = frames[ident]
+            reused += count - 1
+            saved += (count - 1) * frame.width * frame.height * len(frame.getbands())  # a byte per band
+        return reused, saved
+
+    def summary(self):
+        """One line describing how much memory the pool saved"""
+        reused, saved = self.savings()
+        return f"image pool: {reused} images reused, {saved / 1024 / 1024:.1f} MB saved"
+
+
+# the pool used by the whole app
+images = ImagePool()
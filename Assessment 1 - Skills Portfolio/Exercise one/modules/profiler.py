@@ -0,0 +1,84 @@
+"""Startup profiler: times each named phase of launching the app.
+
+Run the app with --profile-startup to print a report once the window is up, or with
+--profile-startup=report.json to write the numbers to a file instead (handy for comparing
+launches after assets change).
+"""
+import json
+import sys
+import time
+
+try:
+    import resource  # not available on Windows
+except ImportError:
+    resource = None
+
+FLAG = "--profile-startup"
+
+
+def peak_rss():
+    """Most memory (bytes) this process has used so far, or None where the system doesn't say"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # macOS gives bytes, Linux gives KB
+
+
+class StartupProfiler:
+    """Splits startup into phases; calling phase() ends the current one and starts the next"""
+
+    def __init__(self, argv):
+        self.enabled = False
+        self.output = None  # JSON file to write to (None prints a table instead)
+        for arg in argv:
+            if arg == FLAG:
+                self.enabled = True
+            elif arg.startswith(FLAG + "="):
+                self.enabled = True
+                self.output = arg.split("=", 1)[1]
+        self.started = time.perf_counter()  # when this module was imported
+        self.current = None  # (name, start time) of the running phase
+        self.phases = []  # finished phases: {"name", "seconds", "peak_rss"}
+
+    def phase(self, name):
+        """Finish the running phase (if any) and start timing a new one"""
+        now = time.perf_counter()
+        self._end(now)
+        self.current = (name, now)
+
+    def _end(self, now):
+        if self.current:
+            name, start = self.current
+            self.phases.append({"name": name, "seconds": now - start, "peak_rss": peak_rss()})
+            self.current = None
+
+    def finish(self):
+        """Finish the last phase and report, if the app was started with the flag"""
+        self._end(time.perf_counter())
+        if self.enabled:
+            if self.output:
+                with open(self.output, "w") as file:
+                    json.dump(self.results(), file, indent=2)
+            else:
+                print(self.report())
+
+    def results(self):
+        return {
+            "total_seconds": sum(phase["seconds"] for phase in self.phases),
+            "peak_rss": peak_rss(),
+            "phases": self.phases,
+        }
+
+    def report(self):
+        """The phases as a table"""
+        lines = [f"{'phase':<24}{'ms':>10}{'peak RSS (MB)':>16}"]
+        for phase in self.phases:
+            rss = "n/a" if phase["peak_rss"] is None else f"{phase['peak_rss'] / 1024 / 1024:.1f}"
+            lines.append(f"{phase['name']:<24}{phase['seconds'] * 1000:>10.1f}{rss:>16}")
+        lines.append(f"{'total':<24}{self.results()['total_seconds'] * 1000:>10.1f}")
+        return "\n".join(lines)
+
+
+# the profiler used by the whole app (import it first so the other imports are timed too)
+profiler = StartupProfiler(sys.argv)
+profiler.phase("imports")
@@ -0,0 +1,108 @@
+from PIL import GifImagePlugin, Image
+import threading
+import time
+import tkinter as tk
+
+from modules.constants import GIF_LOADER_WORKERS, QUALITY_FRAME_BUDGET, QUALITY_COOLDOWN
+
+
+# keep GIF frames as palette indices (8 bits a pixel) instead of having Pillow expand every
+# frame after the first to RGB; only frames that bring their own palette are still expanded
+GifImagePlugin.LOADING_STRATEGY = GifImagePlugin.LoadingStrategy.RGB_AFTER_DIFFERENT_PALETTE_ONLY
+
+
+def palette_of(image):
+    """A palette image holding a GIF's colours, so resized frames can be mapped back onto them"""
+    if image.mode != "P":
+        return image.convert("RGB").quantize()  # no palette of its own, make one up
+    palette = Image.new("P", (1, 1))
+    palette.putpalette(image.getpalette())
+    return palette
+
+
+class Tier:
+    """One way of resizing GIF frames, from best looking to fastest"""
+
+    def __init__(self, name, resample, scale=1):
+        self.name = name
+        self.resample = resample  # PIL resampling filter
+        self.scale = scale  # frames are made this many times smaller and zoomed back up by Tk
+
+    def resize(self, image, size, palette):
+        """Resize a frame for this tier as a palette image (may be smaller than size, see zoom())"""
+        width, height = size
+        size = (width // self.scale, height // self.scale)
+        if self.resample == Image.NEAREST and image.mode == "P":
+            return image.resize(size, Image.NEAREST)  # only picks existing pixels, so the palette still fits
+        # the smoother filters blend colours, so map the result back onto the GIF's palette
+        resized = image.convert("RGB").resize(size, self.resample)
+        return resized.quantize(palette=palette, dither=Image.Dither.NONE)
+
+
+# best quality first (calibrate() drops any that turn out no cheaper than the one above)
+TIERS = [
+    Tier("lanczos", Image.LANCZOS),
+    Tier("bilinear", Image.BILINEAR),
+    Tier("nearest", Image.NEAREST),
+    Tier("half", Image.BILINEAR, scale=2),
+]
+
+
+def zoom(photo, factor, into=None):
+    """Scale a PhotoImage up inside Tk, which is far cheaper than a full size resize in PIL"""
+    # into reuses an earlier zoomed image instead of making a new one
+    big = into or tk.PhotoImage(width=photo.width() * factor, height=photo.height() * factor)
+    big.tk.call(big, "copy", str(photo), "-zoom", factor, factor)
+    return big
+
+
+class Quality:
+    """Picks how nicely GIF frames are resized, based on how fast this computer is"""
+
+    def __init__(self):
+        self.tiers = list(TIERS)  # the tiers to step down through, best first
+        self.level = 0  # index into tiers
+        self.cost = None  # running average of how long a worker takes to resize a frame (seconds)
+        self.cooldown = 0  # resizes to wait before stepping down again
+        self._lock = threading.Lock()  # every loader thread records its resizes
+
+    @property
+    def tier(self):
+        return self.tiers[self.level]
+
+    def calibrate(self, gif_path, size):
+        """Time one resize with each tier and start at the best one that is fast enough"""
+        frame = Image.open(gif_path)
+        frame.load()
+        palette = palette_of(frame)
+        self.tiers, costs = [], []
+        for tier in TIERS:
+            start = time.perf_counter()
+            tier.resize(frame, size, palette)
+            cost = time.perf_counter() - start
+            # a tier that is no cheaper than the one above it would only lower the quality
+            if not costs or cost < costs[-1]:
+                self.tiers.append(tier)
+                costs.append(cost)
+        # the loader resizes on several threads, so each one can take a bit longer
+        budget = QUALITY_FRAME_BUDGET * GIF_LOADER_WORKERS
+        fast = [level for level, cost in enumerate(costs) if cost <= budget]
+        self.level = fast[0] if fast else len(self.tiers) - 1  # nothing was fast enough, use the cheapest
+
+    def record(self, tier, seconds):
+        """Note how long a worker took to resize a frame, stepping down a tier when resizing is too slow"""
+        with self._lock:
+            if tier is not self.tier:
+                return  # resized before the last step down
+            # exponential moving average, so one slow frame doesn't change the tier
+            self.cost = seconds if self.cost is None else self.cost * 0.9 + seconds * 0.1
+            if self.cooldown:
+                self.cooldown -= 1
+            elif self.cost > QUALITY_FRAME_BUDGET * GIF_LOADER_WORKERS and self.level < len(self.tiers) - 1:
+                self.level += 1
+                self.cost = None  # start measuring the new tier from scratch
+                self.cooldown = QUALITY_COOLDOWN
+
+
+# the quality setting used by the whole app
+quality = Quality()
@@ -0,0 +1,75 @@
+import random
+from enum import Enum
+
+from modules.constants import HALLOW_GIF_PATH, JUNGLE_GIF_PATH, CRIMSON_GIF_PATH
+
+# === Difficulty Levels ===
+class Difficulty(Enum):
+    """Stores all difficulty settings in one place"""
+    # format: (level, color, background_path, min_number, max_number)
+    EASY = (0, "#58386c", HALLOW_GIF_PATH, 0, 9)  # single digit numbers
+    MEDIUM = (1, "#2596be", JUNGLE_GIF_PATH, 10, 99)  # two digit numbers
+    HARD = (2, "#896c57", CRIMSON_GIF_PATH, 1000, 9999)  # four digit numbers
+
+    @property
+    def level(self):
+        """Get the difficulty level number"""
+        return self.value[0]
+
+    @property
+    def color(self):
+        """Get the background color for this difficulty"""
+        return self.value[1]
+
+    @property
+    def path(self):
+        """Get the GIF path for this difficulty"""
+        return self.value[2]
+
+    @property
+    def min_val(self):
+        """Get minimum number for this difficulty"""
+        return self.value[3]
+
+    @property
+    def max_val(self):
+        """Get maximum number for this difficulty"""
+        return self.value[4]
+
+
+# === Quiz Logic Functions ===
+class QuizLogic:
+    """Contains all the math quiz logic (separated from UI)"""
+    
+    @staticmethod
+    def random_int(difficulty: Difficulty):
+        """Generate a random number based on difficulty level"""
+        return random.randint(difficulty.min_val, difficulty.max_val)
+
+    @staticmethod
+    def decide_operation():
+        """Randomly choose addition or subtraction"""
+        return random.choice(['+', '-'])
+
+    @staticmethod
+    def generate_problem(difficulty: Difficulty):
+        """Generate a new math problem with two numbers and an operation"""
+        num1 = QuizLogic.random_int(difficulty)
+        num2 = QuizLogic.random_int(difficulty)
+        op = QuizLogic.decide_operation()
+
+        # for subtraction, ensure result is positive (except in Hard mode)
+        if op == '-' and num1 < num2 and difficulty != Difficulty.HARD:
+            num1, num2 = num2, num1
+
+        return num1, num2, op
+
+    @staticmethod
+    def calculate_correct_answer(num1, num2, op):
+        """Calculate the correct answer for a problem"""
+        return num1 + num2 if op == '+' else num1 - num2
+
+    @staticmethod
+    def check_answer(num1, num2, op, user_answer):
+        """Check if the given answer is correct"""
+        return user_answer == QuizLogic.calculate_correct_answer(num1, num2, op)
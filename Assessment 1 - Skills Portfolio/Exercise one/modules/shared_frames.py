@@ -0,0 +1,260 @@
+from multiprocessing import resource_tracker, shared_memory
+from PIL import Image, ImagePalette
+import atexit
+import hashlib
+import os
+import re
+import shutil
+import struct
+import tempfile
+import threading
+import time
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Windows frees a block by itself once the last app using it closes it
+
+from modules.constants import SHARED_FRAMES_VERSION, SHARED_FRAMES_CHUNK
+
+NAME = re.compile(r"gif[0-9a-f]{24}$")  # names of the blocks made here
+ORPHAN_AGE = 60  # seconds a block without a users file has to be left alone before it's swept
+_swept = False  # whether this app has cleared out blocks nobody uses yet
+
+
+class Memory(shared_memory.SharedMemory):
+    """A SharedMemory that can be dropped while frames still point into it"""
+
+    def __del__(self):
+        try:
+            self.close()
+        except BufferError:
+            pass  # the OS unmaps it when the app exits
+
+
+class SharedFrames:
+    """Resized GIF frames kept in shared memory, so every app on this computer can reuse them.
+
+    Frames are stored in blocks of SHARED_FRAMES_CHUNK frames, each named after the GIF's path,
+    modification time, target size, the quality tier that resized it and which frames it holds.
+    A block is only made once some app resizes one of its frames, so only the parts of a GIF
+    that were actually played take up memory. Any other app showing the same GIF at the same
+    size and quality reads frames straight out of the block: its images point into the shared
+    memory, so the pixels are only held once however many apps show them.
+
+    Every app using a block holds a shared lock on its users file; the last one to let go
+    (when it exits) deletes the block, and blocks left behind by apps that crashed, or made for
+    an older version of a GIF, are swept up the next time an app opens one.
+    """
+
+    def __init__(self, key, count, width, height):
+        self.key = key  # which GIF, at which version and size
+        self.count = count
+        self.size = (width, height)
+        self.blocks = {}  # (tier name, chunk) -> Block
+        self._lock = threading.Lock()  # the decode thread and the resize workers all look up blocks
+
+    @classmethod
+    def open(cls, gif_path, count, width, height):
+        """Get the shared frames for this GIF (blocks are attached to as frames are needed)"""
+        stat = os.stat(gif_path)
+        key = f"{SHARED_FRAMES_VERSION}|{os.path.abspath(gif_path)}|{stat.st_mtime_ns}|{width}x{height}"
+        if fcntl:
+            _sweep()
+        frames = cls(key, count, width, height)
+        atexit.register(frames.detach)
+        return frames
+
+    def get(self, index, tier):
+        """Return (image, duration) for a frame another app already stored at this tier, or None"""
+        block = self._block(index, tier, create=False)
+        return block.get(index % SHARED_FRAMES_CHUNK) if block else None
+
+    def put(self, index, image, duration, tier):
+        """Store a frame resized at this tier so other apps can use it"""
+        block = self._block(index, tier, create=True)
+        if block and image.size == block.size:
+            block.put(index % SHARED_FRAMES_CHUNK, image, duration)
+
+    def detach(self):
+        """Stop using every block, deleting the ones no other app is using"""
+        with self._lock:
+            for block in self.blocks.values():
+                block.detach()
+            self.blocks.clear()
+
+    def _block(self, index, tier, create):
+        """The block holding a frame at a tier, attaching to it (or making it) the first time"""
+        chunk = index // SHARED_FRAMES_CHUNK
+        with self._lock:
+            block = self.blocks.get((tier.name, chunk))
+            if block is None:
+                # short name, since some systems (macOS) only allow 31 characters
+                name = "gif" + hashlib.sha1(f"{self.key}|{tier.name}|{chunk}".encode()).hexdigest()[:24]
+                count = min(SHARED_FRAMES_CHUNK, self.count - chunk * SHARED_FRAMES_CHUNK)
+                size = (self.size[0] // tier.scale, self.size[1] // tier.scale)
+                block = Block.open(name, count, size, create)
+                if block:
+                    self.blocks[(tier.name, chunk)] = block
+            return block
+
+
+class Block:
+    """One shared memory block holding a run of resized frames.
+
+    Layout: durations (uint32 ms per frame) | ready flags (1 byte per frame) | frames, each one
+    byte of palette index per pixel followed by its 768 byte palette
+    """
+
+    def __init__(self, shm, name, users, count, size):
+        self.shm = shm
+        self.name = name
+        self.users = users  # file descriptor holding our lock on the users file (None on Windows)
+        self.size = size
+        self.pixel_bytes = size[0] * size[1]  # frames are stored as palette images
+        self.frame_bytes = self.pixel_bytes + 768
+        self.ready_at = count * 4  # where the ready flags start
+        self.frames_at = self.ready_at + count  # where the pixel data starts
+
+    @classmethod
+    def open(cls, name, count, size, create):
+        """Attach to a block (making it if create is set), or None if it isn't there or can't be made"""
+        length = count * (4 + 1 + size[0] * size[1] + 768)
+        users = _join(name) if fcntl else None
+        try:
+            try:
+                shm = Memory(name)  # another app already made it
+            except FileNotFoundError:
+                if not create or not cls._has_room(length):
+                    # nobody has stored these frames yet, or filling it would crash the app once
+                    # shared memory runs out
+                    _leave(name, users)
+                    return None
+                shm = Memory(name, create=True, size=length)
+        except FileExistsError:
+            _leave(name, users)
+            return None  # another app is creating it right now, resize our own frames this time
+        except (OSError, ValueError):
+            _leave(name, users)
+            return None  # shared memory isn't available here (or is still being set up)
+
+        if os.name == "posix":
+            # Python would delete the block when this app exits even if other apps still use it,
+            # detach() does that only once the last one is done
+            resource_tracker.unregister(shm._name, "shared_memory")
+        if shm.size < length:
+            shm.close()
+            _leave(name, users)
+            return None
+        return cls(shm, name, users, count, size)
+
+    @staticmethod
+    def _has_room(size):
+        """Check there is enough free shared memory for a new block"""
+        if not os.path.isdir("/dev/shm"):
+            return True  # Windows and macOS reserve the memory when it's created
+        return shutil.disk_usage("/dev/shm").free > size
+
+    def detach(self):
+        """Stop using the block, deleting it if no other app is using it"""
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # frames still point into it, the memory goes when the app exits
+        _leave(self.name, self.users)
+        self.users = None
+
+    def get(self, slot):
+        """Return (image, duration) for a stored frame, or None"""
+        if not self.shm.buf[self.ready_at + slot]:
+            return None
+        (duration,) = struct.unpack_from("<I", self.shm.buf, slot * 4)
+        start = self.frames_at + slot * self.frame_bytes
+        # frombuffer reads the pixels in place instead of copying them into this app
+        image = Image.frombuffer("P", self.size, self.shm.buf[start:start + self.pixel_bytes], "raw", "P", 0, 1)
+        # setting the palette directly, putpalette() would copy the read-only pixels first
+        image.palette = ImagePalette.raw("RGB", bytes(self.shm.buf[start + self.pixel_bytes:start + self.frame_bytes]))
+        return image, duration
+
+    def put(self, slot, image, duration):
+        """Store a resized frame so other apps can use it"""
+        if self.shm.buf[self.ready_at + slot]:
+            return  # someone else got there first
+        start = self.frames_at + slot * self.frame_bytes
+        palette = bytes(image.getpalette()).ljust(768, b"\0")  # padded to all 256 colours
+        self.shm.buf[start:start + self.frame_bytes] = image.tobytes() + palette
+        struct.pack_into("<I", self.shm.buf, slot * 4, duration or 0)
+        # mark it ready last, so nobody reads a half-written frame
+        self.shm.buf[self.ready_at + slot] = 1
+
+
+def _users_path(name):
+    return os.path.join(tempfile.gettempdir(), name + ".users")
+
+
+def _join(name):
+    """Take a shared lock on a block's users file, returning its descriptor"""
+    while True:
+        users = os.open(_users_path(name), os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(users, fcntl.LOCK_SH)
+        if os.fstat(users).st_nlink:
+            return users
+        os.close(users)  # the last user deleted it while we waited, start a new one
+
+
+def _leave(name, users):
+    """Let go of a block, deleting it if nobody else holds its users file"""
+    if users is None:
+        return
+    try:
+        fcntl.flock(users, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(users)  # still in use by another app
+        return
+    _unlink(name)  # the block goes first, so there's never a block without a users file
+    os.unlink(_users_path(name))
+    os.close(users)
+
+
+def _unlink(name):
+    try:
+        shm = shared_memory.SharedMemory(name)
+    except (FileNotFoundError, OSError, ValueError):
+        return
+    shm.close()
+    shm.unlink()
+
+
+def _sweep():
+    """Delete blocks no app is using (left by a crash, or for a GIF that has since changed)"""
+    global _swept
+    if _swept:
+        return
+    _swept = True
+    folder = tempfile.gettempdir()
+    for entry in os.listdir(folder):
+        name, ext = os.path.splitext(entry)
+        if ext != ".users" or not NAME.match(name):
+            continue
+        try:
+            users = os.open(os.path.join(folder, entry), os.O_RDWR)
+        except OSError:
+            continue
+        try:
+            fcntl.flock(users, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(users)  # in use
+            continue
+        if os.fstat(users).st_nlink:
+            _unlink(name)
+            os.unlink(os.path.join(folder, entry))
+        os.close(users)
+    if os.path.isdir("/dev/shm"):
+        # blocks from before users files existed
+        for name in os.listdir("/dev/shm"):
+            path = os.path.join("/dev/shm", name)
+            try:
+                if NAME.match(name) and not os.path.exists(_users_path(name)) \
+                        and time.time() - os.path.getmtime(path) > ORPHAN_AGE:
+                    _unlink(name)
+            except OSError:
+                pass
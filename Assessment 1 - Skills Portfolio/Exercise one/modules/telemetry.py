@@ -0,0 +1,150 @@
+"""Frame timing telemetry: how far animations and the countdown drift from their schedule.
+
+Press F3 (TELEMETRY_HUD_KEY) in the app to show or hide a live overlay of the numbers, or run
+it with --telemetry=stats.json to have them written to that file every few seconds. Both
+include how much memory the image pool is saving.
+"""
+from collections import deque
+import json
+import sys
+import time
+import tkinter as tk
+
+from modules.clock import clock
+from modules.constants import (TELEMETRY_SAMPLES, TELEMETRY_LATE, TELEMETRY_HUD_KEY, TELEMETRY_HUD_INTERVAL,
+                               TELEMETRY_DUMP_INTERVAL, TELEMETRY_GROUP)
+from modules.image_pool import images
+
+FLAG = "--telemetry="
+
+
+def percentiles(samples):
+    """p50 / p95 / p99 / max of some timings, in milliseconds"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    pick = lambda p: ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000
+    return {"p50": pick(0.5), "p95": pick(0.95), "p99": pick(0.99), "max": ordered[-1] * 1000}
+
+
+class Channel:
+    """Timings for one repeating job (a GIF, the countdown...)"""
+
+    def __init__(self, name, interval=None):
+        self.name = name
+        self.interval = interval  # seconds between ticks for fixed rate jobs (None if each tick gives its due time)
+        # only the latest samples are kept, so this never grows
+        self.jitter = deque(maxlen=TELEMETRY_SAMPLES)  # actual minus intended time between ticks
+        self.lateness = deque(maxlen=TELEMETRY_SAMPLES)  # how long after its due time each tick ran
+        self.draws = deque(maxlen=TELEMETRY_SAMPLES)  # time spent updating the widget each tick
+        self.ticks = 0
+        self.late = 0  # ticks more than TELEMETRY_LATE behind schedule
+        self.dropped = 0  # frames skipped to catch up
+        self.stalls = 0  # ticks where the frame wasn't decoded in time
+        self.last_due = None
+        self.last_time = None
+
+    def start(self):
+        """Begin a new run (the gap since the last run isn't jitter)"""
+        self.last_due = self.last_time = None
+
+    def tick(self, due=None):
+        """Note that the job ran; due is when it was meant to (worked out from interval if None)"""
+        now = time.monotonic()
+        if due is None:
+            due = now if self.last_due is None else self.last_due + self.interval
+        if self.last_due is not None:
+            self.jitter.append((now - self.last_time) - (due - self.last_due))
+        self.lateness.append(now - due)
+        if now - due > TELEMETRY_LATE:
+            self.late += 1
+        self.ticks += 1
+        self.last_due, self.last_time = due, now
+
+    def drop(self, count):
+        self.dropped += count
+
+    def stall(self):
+        self.stalls += 1
+
+    def draw(self, seconds):
+        """Note how long a widget update (label.config and friends) took"""
+        self.draws.append(seconds)
+
+    def stats(self):
+        return {
+            "ticks": self.ticks,
+            "late": self.late,
+            "dropped": self.dropped,
+            "stalls": self.stalls,
+            "jitter_ms": percentiles([abs(j) for j in self.jitter]),
+            "lateness_ms": percentiles(self.lateness),
+            "draw_ms": percentiles(self.draws),
+        }
+
+
+class Telemetry:
+    """Every channel, plus the overlay and the periodic JSON dump"""
+
+    def __init__(self, argv):
+        self.channels = {}  # name -> Channel
+        self.root = None
+        self.hud = None  # overlay label while it's shown
+        self.refresh_job = None  # clock subscription updating the overlay
+        self.dump_path = next((arg[len(FLAG):] for arg in argv if arg.startswith(FLAG)), None)
+
+    def channel(self, name, interval=None):
+        """Get the channel with this name, making it the first time"""
+        if name not in self.channels:
+            self.channels[name] = Channel(name, interval)
+        return self.channels[name]
+
+    def snapshot(self):
+        return {name: channel.stats() for name, channel in self.channels.items()}
+
+    def attach(self, root):
+        """Bind the overlay key and start dumping if the app was run with --telemetry="""
+        self.root = root
+        root.bind_all(TELEMETRY_HUD_KEY, lambda e: self.toggle())
+        if self.dump_path:
+            clock.every(TELEMETRY_DUMP_INTERVAL, self.dump, delay=TELEMETRY_DUMP_INTERVAL, group=TELEMETRY_GROUP)
+
+    def dump(self):
+        reused, saved = images.savings()
+        stats = dict(self.snapshot(), image_pool={"reused": reused, "bytes_saved": saved})
+        with open(self.dump_path, "w") as file:
+            json.dump(stats, file, indent=2)
+
+    def toggle(self):
+        """Show or hide the overlay"""
+        if self.hud:
+            self.hud.destroy()
+            self.hud = None
+            self.refresh_job.cancel()
+            return
+        self.hud = tk.Label(self.root, font=("Courier", 9), justify="left", anchor="nw", bg="black", fg="#00FF00")
+        self.hud.place(x=0, y=0)
+        self.refresh_job = clock.every(TELEMETRY_HUD_INTERVAL, self.refresh, group=TELEMETRY_GROUP)
+
+    def refresh(self):
+        self.hud.lift()  # stay on top when screens are switched
+        self.hud.config(text=self.report())
+
+    def report(self):
+        """The numbers as text for the overlay"""
+        lines = []
+        for name, stats in self.snapshot().items():
+            jitter = stats["jitter_ms"] or {}
+            draw = stats["draw_ms"] or {}
+            lines.append(
+                f"{name:<16} ticks {stats['ticks']:>6}  late {stats['late']:>4}  dropped {stats['dropped']:>4}  "
+                f"stalls {stats['stalls']:>4}  jitter p50/p95/p99 {jitter.get('p50', 0):5.1f}/"
+                f"{jitter.get('p95', 0):5.1f}/{jitter.get('p99', 0):5.1f} ms  draw p95 {draw.get('p95', 0):5.2f} ms"
+            )
+        lines = lines or ["no timings yet"]
+        lines.append(images.summary())  # memory saved by sharing identical images
+        return "\n".join(lines)
+
+
+# the telemetry used by the whole app
+telemetry = Telemetry(sys.argv)
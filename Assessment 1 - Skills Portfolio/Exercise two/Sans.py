@@ -1,14 +1,19 @@
+from modules.profiler import profiler  # first, so the startup report covers the imports too
 import tkinter as tk
 from tkinter import font as tkfont
-from PIL import Image, ImageTk
-import random
-import pygame
 import platform
+profiler.phase("import modules")
+from modules.audio import audio
+from modules.clock import clock
+from modules.compositor import CanvasImage, Compositor
 from modules.gif import GIFPlayer
+from modules.image_pool import images
+from modules.jokes import Corpus, Shuffle
+from modules.quality import quality
+from modules.telemetry import telemetry
+from modules.typewriter import Typewriter
 from modules.constants import *
 
-root = tk.Tk()
-pygame.mixer.init()
 
 class SansJokeApp:
     def __init__(self, root):
@@ -16,13 +21,16 @@ class SansJokeApp:
         self.root.title(WINDOW_TITLE)
         
         # === initialiation ===
-        self.jokes = self.load_jokes() # load jokes 
+        profiler.phase("jokes")
+        self.jokes = Corpus(JOKES_FILE_PATH) # jokes are read from the file one at a time when picked
+        self.joke_order = Shuffle(len(self.jokes), JOKES_ORDER_PATH) # every joke once before any repeat, even across runs
+        # jokes added to the file while the app is running are picked up without a restart
+        clock.every(JOKES_POLL_INTERVAL, self.reload_jokes, delay=JOKES_POLL_INTERVAL)
+        profiler.phase("setup")
         self.root.geometry(f"{WINDOW_WIDTH}x{WINDOW_HEIGHT}")
         self.root.config(bg=BG_COLOR)
         self.root.resizable(False, False)  # prevent window resizing
         self.current_joke = None  # stores the currently selected joke
-        self.animation_text = None  # dialogue typewriter animation
-        self.animation_comment = None  # sans comment typewriter animation
         self.is_typing = False  # prevents button clicks during typing
         self.is_music_playing = True  # tracks mute state
         self.button_enabled = {'punchline': False, 'next': False}  # track which buttons are clickable
@@ -40,115 +48,112 @@ class SansJokeApp:
         self.sans_font = tkfont.Font(family=FONT_FAMILY, size=sans_size)
         
         # preload all images before creating window
+        profiler.phase("load_images")
         self.load_images()
+        profiler.phase("canvas")
         
         # === canvas and background ===
         self.canvas = tk.Canvas(root, width=WINDOW_WIDTH, height=WINDOW_HEIGHT, bg=BG_COLOR, highlightthickness=0)
         self.canvas.pack(fill="both", expand=True)
+        # everything is drawn as canvas items, so a GIF frame swap doesn't make Tk redraw stacked widgets
+        self.ui = Compositor(self.canvas)
         
-        # background label holds the GIFs
-        self.label_bg = tk.Label(self.canvas, bg=BG_COLOR)
-        self.label_bg.place(x=0, y=0, width=WINDOW_WIDTH, height=WINDOW_HEIGHT)
+        # background image item holds the GIFs
+        self.bg = CanvasImage(self.ui, self.ui.image(0, 0))
         
         # load all GIF animations
+        profiler.phase("load_gifs")
         self.load_gifs()
+        profiler.phase("widgets")
         
         # === text boxes ===
         # sans comment box appears on startup 
-        self.text_sans = tk.Text(
-            self.canvas, font=self.sans_font, bg="#FFFFFF", fg="#000000", wrap="word",
-            relief="flat", highlightthickness=0, padx=10, pady=10, spacing1=5,
-            spacing2=SANS_COMMENT_SPACING, spacing3=5, state="disabled", cursor="arrow"
+        self.box_sans = self.ui.box(SANS_COMMENT_X, SANS_COMMENT_Y, SANS_COMMENT_WIDTH, SANS_COMMENT_HEIGHT, "#FFFFFF")
+        self.text_sans = Typewriter(
+            self.ui, SANS_COMMENT_X + SANS_COMMENT_PADDING, SANS_COMMENT_Y + SANS_COMMENT_PADDING,
+            SANS_COMMENT_WIDTH - 2 * SANS_COMMENT_PADDING, self.sans_font, "#000000", "sans"
         )
-        self.text_sans.place(x=SANS_COMMENT_X, y=SANS_COMMENT_Y, width=SANS_COMMENT_WIDTH, height=SANS_COMMENT_HEIGHT)
         
         # main dialogue box displays both narrator text and jokes
-        self.label_dialogue = tk.Label(
-            self.canvas, text="", font=self.dialogue_font, bg=BG_COLOR, fg="#FFFFFF",
-            wraplength=DIALOGUE_WIDTH, justify="left", anchor="nw"
-        )
-        self.label_dialogue.place(x=DIALOGUE_X + INITIAL_TEXT_X_OFFSET, y=DIALOGUE_Y + DIALOGUE_TEXT_Y_OFFSET, width=DIALOGUE_WIDTH, height=DIALOGUE_TEXT_HEIGHT)
+        self.box_dialogue = self.ui.box(DIALOGUE_X + INITIAL_TEXT_X_OFFSET, DIALOGUE_Y + DIALOGUE_TEXT_Y_OFFSET, DIALOGUE_WIDTH, DIALOGUE_TEXT_HEIGHT, BG_COLOR)
+        self.text_dialogue = Typewriter(self.ui, DIALOGUE_X + INITIAL_TEXT_X_OFFSET, DIALOGUE_Y + DIALOGUE_TEXT_Y_OFFSET, DIALOGUE_WIDTH, self.dialogue_font, "#FFFFFF", "dialogue")
         
         # === buttons ===
         # tell joke button 
-        self.btn_tell = tk.Label(self.canvas, image=self.img_tell, bg=BG_COLOR, cursor="hand2")
-        self.btn_tell.place(x=TELL_JOKE_BTN_X, y=BUTTON_Y, width=TELL_JOKE_WIDTH, height=TELL_JOKE_HEIGHT)
-        self.btn_tell.bind("<Button-1>", lambda e: self.tell_joke())
+        self.btn_tell = self.ui.button(TELL_JOKE_BTN_X, BUTTON_Y, TELL_JOKE_WIDTH, TELL_JOKE_HEIGHT, self.img_tell, self.tell_joke)
         
         # punchline button - disabled until setup finishes
-        self.btn_punchline = tk.Label(self.canvas, image=self.img_punchline_gray, bg=BG_COLOR, cursor="hand2")
-        self.btn_punchline.place(x=SHOW_PUNCHLINE_BTN_X, y=BUTTON_Y, width=PUNCHLINE_WIDTH, height=PUNCHLINE_HEIGHT)
+        self.btn_punchline = self.ui.button(SHOW_PUNCHLINE_BTN_X, BUTTON_Y, PUNCHLINE_WIDTH, PUNCHLINE_HEIGHT, self.img_punchline_gray)
         
         # next joke button - only enabled after punchline is shown
-        self.btn_next = tk.Label(self.canvas, image=self.img_next_gray, bg=BG_COLOR, cursor="hand2")
-        self.btn_next.place(x=NEXT_JOKE_BTN_X, y=BUTTON_Y, width=NEXT_JOKE_WIDTH, height=NEXT_JOKE_HEIGHT)
+        self.btn_next = self.ui.button(NEXT_JOKE_BTN_X, BUTTON_Y, NEXT_JOKE_WIDTH, NEXT_JOKE_HEIGHT, self.img_next_gray)
         
         # quit button - always enabled
-        self.btn_quit = tk.Label(self.canvas, image=self.img_quit, bg=BG_COLOR, cursor="hand2")
-        self.btn_quit.place(x=QUIT_BTN_X, y=BUTTON_Y, width=QUIT_WIDTH, height=QUIT_HEIGHT)
-        self.btn_quit.bind("<Button-1>", lambda e: self.quit())
+        self.btn_quit = self.ui.button(QUIT_BTN_X, BUTTON_Y, QUIT_WIDTH, QUIT_HEIGHT, self.img_quit, self.quit)
         
         # mute button - controls music and sound effects
-        self.btn_mute = tk.Label(self.canvas, image=self.img_mute, bg=BG_COLOR, cursor="hand2")
-        self.btn_mute.place(x=MUTE_BTN_X, y=MUTE_BTN_Y, width=MUTE_WIDTH, height=MUTE_HEIGHT)
-        self.btn_mute.bind("<Button-1>", lambda e: self.toggle_music())
+        self.btn_mute = self.ui.button(MUTE_BTN_X, MUTE_BTN_Y, MUTE_WIDTH, MUTE_HEIGHT, self.img_mute, self.toggle_music)
+        
+        # nothing to tell until jokes are added to the file
+        if not len(self.jokes):
+            self.set_button(self.btn_tell, False)
+        
+        # clicking anywhere else shows the rest of the text being typed
+        self.ui.background_click = self.finish_typing
+        
+        # F3 shows frame timings on top of everything
+        telemetry.attach(self.root, self.ui)
         
         # === startup ===
         # show idle animation and start typewriter style text
         self.play_gif(self.gif_idle)
         self.is_typing = True
+        profiler.phase("play_music")
         self.play_music()
+        profiler.phase("first draw")
         self.start_typing()
 
     # === gif management ===
     def load_gifs(self):
-        """load all GIFs into memory at startup"""
-        # each GIF is preloaded so transitions are smooth
-        self.gif_idle = GIFPlayer(self.label_bg, IDLE_GIF, WINDOW_WIDTH, WINDOW_HEIGHT)
-        self.gif_setup = GIFPlayer(self.label_bg, SETUP_GIF, WINDOW_WIDTH, WINDOW_HEIGHT)
-        self.gif_punch = GIFPlayer(self.label_bg, PUNCH_GIF, WINDOW_WIDTH, WINDOW_HEIGHT)
+        """create the GIF players used for the background"""
+        # GIFs decode in the background so the window shows up right away, and every frame is
+        # kept so switching between them never waits for a decode
+        self.gif_idle = GIFPlayer(self.bg, IDLE_GIF, WINDOW_WIDTH, WINDOW_HEIGHT)
+        self.gif_setup = GIFPlayer(self.bg, SETUP_GIF, WINDOW_WIDTH, WINDOW_HEIGHT)
+        self.gif_punch = GIFPlayer(self.bg, PUNCH_GIF, WINDOW_WIDTH, WINDOW_HEIGHT)
 
     def play_gif(self, gif):
         """stop all GIFs and play the specified one"""
         # ensures only one animation plays at a time
-        GIFPlayer.stop_all()
+        clock.unsubscribe_group(GIF_GROUP)
         gif.play()
 
     # === image management ===
     def load_images(self):
         """load and resize all button images"""
+        # images come from the shared pool, so an image already loaded at that size is reused
         # tell joke button with enabled and disabled states
-        img = Image.open(TELL_JOKE_IMG)
-        img = img.resize((TELL_JOKE_WIDTH, TELL_JOKE_HEIGHT), Image.LANCZOS)
-        self.img_tell = ImageTk.PhotoImage(img)
+        size = (TELL_JOKE_WIDTH, TELL_JOKE_HEIGHT)
+        self.img_tell = images.load(TELL_JOKE_IMG, size)
         # grayscale version indicates button is disabled
-        self.img_tell_gray = ImageTk.PhotoImage(img.convert('L').convert('RGB'))
+        self.img_tell_gray = images.gray(TELL_JOKE_IMG, size)
         
         # punchline button images
-        img = Image.open(PUNCHLINE_IMG)
-        img = img.resize((PUNCHLINE_WIDTH, PUNCHLINE_HEIGHT), Image.LANCZOS)
-        self.img_punchline = ImageTk.PhotoImage(img)
-        self.img_punchline_gray = ImageTk.PhotoImage(img.convert('L').convert('RGB'))
+        size = (PUNCHLINE_WIDTH, PUNCHLINE_HEIGHT)
+        self.img_punchline = images.load(PUNCHLINE_IMG, size)
+        self.img_punchline_gray = images.gray(PUNCHLINE_IMG, size)
         
         # next joke button images
-        img = Image.open(NEXT_JOKE_IMG)
-        img = img.resize((NEXT_JOKE_WIDTH, NEXT_JOKE_HEIGHT), Image.LANCZOS)
-        self.img_next = ImageTk.PhotoImage(img)
-        self.img_next_gray = ImageTk.PhotoImage(img.convert('L').convert('RGB'))
+        size = (NEXT_JOKE_WIDTH, NEXT_JOKE_HEIGHT)
+        self.img_next = images.load(NEXT_JOKE_IMG, size)
+        self.img_next_gray = images.gray(NEXT_JOKE_IMG, size)
         
         # quit button - no disabled state needed
-        img = Image.open(QUIT_IMG)
-        img = img.resize((QUIT_WIDTH, QUIT_HEIGHT), Image.LANCZOS)
-        self.img_quit = ImageTk.PhotoImage(img)
+        self.img_quit = images.load(QUIT_IMG, (QUIT_WIDTH, QUIT_HEIGHT))
         
         # mute button has two states - one for music on, one for music off
-        img = Image.open(UNMUTE_IMG)
-        img = img.resize((MUTE_WIDTH, MUTE_HEIGHT), Image.LANCZOS)
-        self.img_mute = ImageTk.PhotoImage(img)  # shows when music is playing
-        
-        img = Image.open(MUTE_IMG)
-        img = img.resize((MUTE_WIDTH, MUTE_HEIGHT), Image.LANCZOS)
-        self.img_unmute = ImageTk.PhotoImage(img)  # shows when music is muted
+        self.img_mute = images.load(UNMUTE_IMG, (MUTE_WIDTH, MUTE_HEIGHT))  # shows when music is playing
+        self.img_unmute = images.load(MUTE_IMG, (MUTE_WIDTH, MUTE_HEIGHT))  # shows when music is muted
     
     # === typewriter text effects ===
     def start_typing(self):
@@ -158,75 +163,61 @@ class SansJokeApp:
         # initial dialogue is narrator (no sound effects)
         self.type_dialogue(INITIAL_DIALOGUE_MESSAGE, sans_speaking=False)
     
-    def type_sans(self, text, index=0):
+    def type_sans(self, text):
         """animate Sans comment box character by character with sound"""
-        if index <= len(text):
-            # update text box with next character
-            self.text_sans.config(state="normal")
-            self.text_sans.delete("1.0", "end")
-            self.text_sans.insert("1.0", text[:index])
-            self.text_sans.config(state="disabled")
-            
-            # play talking sound for each letter if music is enabled
-            # skip spaces to avoid extra sounds
-            if self.is_music_playing and index > 0 and text[index - 1] != ' ':
-                try:
-                    pygame.mixer.Sound(LETTER_SOUND_PATH).play()
-                except:
-                    pass  # continue if sound fails to play
-            
-            # schedule next character after delay using animation_comment to store the scheduled task
-            self.animation_comment = self.root.after(TYPEWRITER_SPEED, self.type_sans, text, index + 1)
+        def on_char(new):
+            # play talking sound for the new letters if music is enabled
+            # (one sound even if a slow tick showed several at once), skip spaces to avoid extra sounds
+            if self.is_music_playing and new.strip(' '):
+                audio.sound(LETTER_SOUND_PATH)
+
+        self.text_sans.type(text, on_char)
     
-    def type_dialogue(self, text, index=0, callback=None, sans_speaking=False):
+    def type_dialogue(self, text, callback=None, sans_speaking=False):
         """animate dialogue box character by character"""
-        if index <= len(text):
-            # update dialogue with next character
-            self.label_dialogue.config(text=text[:index])
-            
+        def on_char(new):
             # only play sound if Sans is speaking (not narrator)
             # skip punctuation to avoid sound effects on punctuation marks
-            if sans_speaking and self.is_music_playing and index > 0 and text[index - 1] not in ' .,!?':
-                try:
-                    pygame.mixer.Sound(LETTER_SOUND_PATH).play()
-                except:
-                    pass  # continue if sound fails to play
-            
-            # schedule next character after delay using animation_text to store the scheduled task
-            self.animation_text = self.root.after(TYPEWRITER_SPEED, self.type_dialogue, text, index + 1, callback, sans_speaking)
-        else:
+            if sans_speaking and self.is_music_playing and new.strip(' .,!?'):
+                audio.sound(LETTER_SOUND_PATH)
+
+        def done():
             # typing is complete
             self.is_typing = False
             # trigger callback if provided (used for button state changes)
             if callback:
                 callback()
+
+        self.text_dialogue.type(text, on_char, done)
+    
+    def finish_typing(self):
+        """show the rest of the text being typed right away"""
+        self.text_sans.finish()
+        self.text_dialogue.finish()
     
     def stop_typing(self):
         """cancel all active typewriter animations and reset state"""
-        # cancel scheduled dialogue animation
-        if self.animation_text: 
-            self.root.after_cancel(self.animation_text)
-            self.animation_text = None
-        # cancel scheduled Sans comment animation
-        if self.animation_comment: 
-            self.root.after_cancel(self.animation_comment)
-            self.animation_comment = None
+        # unsubscribing the group cancels both the dialogue and Sans comment typing
+        clock.unsubscribe_group(TYPING_GROUP)
         # allow user interaction
         self.is_typing = False
     
     # === getting the jokes ===
-    def load_jokes(self):
-        """load all jokes from the jokes file"""
-        jokes = []
-        with open(JOKES_FILE_PATH, 'r', encoding='utf-8') as file:
-            for line in file:
-                line = line.strip()
-                # split setup and punchline by the question mark
-                parts = line.split('?', 1)
-                setup = parts[0].strip() + '?'  # keep question mark with setup
-                punchline = parts[1].strip()
-                jokes.append({'setup': setup, 'punchline': punchline})
-        return jokes
+    def reload_jokes(self):
+        """pick up changes to the jokes file"""
+        if self.jokes.refresh():
+            self.joke_order.resize(len(self.jokes))
+            if self.current_joke is None:
+                # before the first joke, tell joke is only clickable while there are jokes to tell
+                self.set_button(self.btn_tell, len(self.jokes) > 0)
+    
+    def pick_joke(self):
+        """the next joke in the shuffled order, skipping lines that aren't jokes any more"""
+        for _ in range(len(self.jokes)):
+            joke = self.jokes.joke(next(self.joke_order))
+            if joke:
+                return joke
+        return None
     
     # === buttons ===
     def set_button(self, button, enabled):
@@ -235,72 +226,78 @@ class SansJokeApp:
             # track if punchline button is clickable
             self.button_enabled['punchline'] = enabled
             if enabled:
-                # show colored image and bind click handler
-                button.config(image=self.img_punchline)
-                button.bind("<Button-1>", lambda e: self.show_punchline())
+                # show colored image and set click handler
+                self.ui.set_image(button, self.img_punchline)
+                self.ui.set_callback(button, self.show_punchline)
             else:
                 # show grayscale image and remove click handler
-                button.config(image=self.img_punchline_gray)
-                button.unbind("<Button-1>")
+                self.ui.set_image(button, self.img_punchline_gray)
+                self.ui.set_callback(button, None)
         elif button == self.btn_next:
             # track if next button is clickable
             self.button_enabled['next'] = enabled
             if enabled:
-                button.config(image=self.img_next)
-                button.bind("<Button-1>", lambda e: self.next_joke())
+                self.ui.set_image(button, self.img_next)
+                self.ui.set_callback(button, self.next_joke)
             else:
-                button.config(image=self.img_next_gray)
-                button.unbind("<Button-1>")
+                self.ui.set_image(button, self.img_next_gray)
+                self.ui.set_callback(button, None)
         elif button == self.btn_tell:
             # tell joke button is always clickable when not typing
             if enabled:
-                button.config(image=self.img_tell)
-                button.bind("<Button-1>", lambda e: self.tell_joke())
+                self.ui.set_image(button, self.img_tell)
+                self.ui.set_callback(button, self.tell_joke)
             else:
-                button.config(image=self.img_tell_gray)
-                button.unbind("<Button-1>")
+                self.ui.set_image(button, self.img_tell_gray)
+                self.ui.set_callback(button, None)
     
     # === music ===
     def play_music(self):
         """start background music on loop"""
-        # load music file
-        pygame.mixer.music.load(MUSIC_PATH)
-        pygame.mixer.music.play(-1) # -1 means infinite loop
+        # loops forever (the mixer may still be starting, then it plays as soon as it's ready)
+        audio.play_music(MUSIC_PATH)
         self.is_music_playing = True
         # show unmute icon to indicate music is playing
-        self.btn_mute.config(image=self.img_mute)
+        self.ui.set_image(self.btn_mute, self.img_mute)
     
     def toggle_music(self):
         """pause or resume music and update button visual"""
         if self.is_music_playing:
             # music is playing, so pause it
-            pygame.mixer.music.pause()
+            audio.pause()
             self.is_music_playing = False
             # show mute icon to indicate music is off
-            self.btn_mute.config(image=self.img_unmute)
+            self.ui.set_image(self.btn_mute, self.img_unmute)
         else:
             # music is paused, so resume it
-            pygame.mixer.music.unpause()
+            audio.resume()
             self.is_music_playing = True
             # show unmute icon to indicate music is on
-            self.btn_mute.config(image=self.img_mute)
+            self.ui.set_image(self.btn_mute, self.img_mute)
     
     # === joke flow ===
     def tell_joke(self):
         """display joke setup and prepare for punchline"""
         # only allow new joke if not currently typing
         if not self.is_typing:
+            # next joke in the shuffled order
+            joke = self.pick_joke()
+            if joke is None:
+                # no jokes (or the file is mid-edit), the button comes back once the file is reloaded
+                self.set_button(self.btn_tell, False)
+                return
+            self.current_joke = joke
+            
             # hide Sans comment box 
-            self.text_sans.place_forget()
+            self.ui.hide(self.box_sans)
+            self.text_sans.hide()
             # switch to setup GIF animation
             self.play_gif(self.gif_setup)
             
             # reposition dialogue box for better joke display
-            self.label_dialogue.place(x=DIALOGUE_X + DIALOGUE_TEXT_X_OFFSET, y=DIALOGUE_Y + DIALOGUE_TEXT_Y_OFFSET, width=DIALOGUE_WIDTH - 40, height=DIALOGUE_TEXT_HEIGHT)
-            self.label_dialogue.config(fg="#FFFFFF", bg=BG_COLOR, wraplength=DIALOGUE_WIDTH - 60)
-            
-            # randomly select a joke from loaded jokes
-            self.current_joke = random.choice(self.jokes)
+            x, y = DIALOGUE_X + DIALOGUE_TEXT_X_OFFSET, DIALOGUE_Y + DIALOGUE_TEXT_Y_OFFSET
+            self.ui.move(self.box_dialogue, x, y, DIALOGUE_WIDTH - 40, DIALOGUE_TEXT_HEIGHT)
+            self.text_dialogue.move(x, y, width=DIALOGUE_WIDTH - 60)
             
             # stop any previous animation
             self.stop_typing()
@@ -350,11 +347,22 @@ class SansJokeApp:
         # stop typing animations
         self.stop_typing()
         # stop music
-        pygame.mixer.music.stop()
+        audio.stop()
         # stop all GIF animations
-        GIFPlayer.stop_all()
+        clock.unsubscribe_group(GIF_GROUP)
         # close window
         self.root.quit()
 
-app = SansJokeApp(root)
-root.mainloop()
\ No newline at end of file
+# only runs when started directly, so the app can be imported (e.g. by the benchmarks) without opening
+if __name__ == "__main__":
+    profiler.phase("window")
+    root = tk.Tk()
+    clock.attach(root)  # GIFs and typewriters all tick through this one clock
+    profiler.phase("calibrate quality")
+    quality.calibrate(IDLE_GIF, (WINDOW_WIDTH, WINDOW_HEIGHT))  # resize quality this computer can keep up with
+
+    app = SansJokeApp(root)
+    root.after_idle(profiler.finish)  # startup is over once Tk has drawn the window and gone idle
+    root.after_idle(audio.start)  # sound starts up in the background once the window is showing
+    root.mainloop()
+    audio.close()  # let the audio thread stop the music before exiting
\ No newline at end of file
@@ -0,0 +1,151 @@
+import queue
+import threading
+import time
+
+from modules.constants import SOUND_EFFECTS, SOUND_VOICES, SOUND_STALE, AUDIO_CLOSE_TIMEOUT
+
+
+class SoundBank:
+    """sound effects decoded once and played on a fixed set of reserved mixer channels.
+
+    playing a sound never touches the disk or makes a new Sound. with every voice busy the one
+    that started longest ago is cut off, a new blip matters more than the tail of an old one.
+    """
+
+    def __init__(self, mixer, paths, voices):
+        self.sounds = {}  # path -> decoded Sound
+        for path in paths:
+            self.load(mixer, path)
+        # keep these channels out of pygame's own channel picking, only the bank plays on them
+        mixer.set_num_channels(max(voices, mixer.get_num_channels()))
+        mixer.set_reserved(voices)
+        self.voices = [mixer.Channel(i) for i in range(voices)]
+        self.next = 0  # voice that started longest ago, voices are used in turn
+
+    def load(self, mixer, path):
+        try:
+            self.sounds[path] = mixer.Sound(path)
+        except Exception:
+            self.sounds[path] = None  # unplayable, don't try the file again
+
+    def play(self, path):
+        sound = self.sounds.get(path)
+        if sound is None:
+            return
+        # a free voice if there is one, otherwise steal the oldest
+        for offset in range(len(self.voices)):
+            index = (self.next + offset) % len(self.voices)
+            if not self.voices[index].get_busy():
+                break
+        else:
+            index = self.next
+        self.voices[index].play(sound)
+        self.next = (index + 1) % len(self.voices)
+
+
+class Audio:
+    """pygame's mixer, owned by an audio thread that the Tk side only sends commands to.
+
+    every method just puts a command on a queue and returns, so a slow or stuck audio backend
+    can't freeze the window. the thread imports pygame and starts the mixer first (slow, which
+    is why it's started after the window shows), then runs the commands in order. music commands
+    always run, but sound effects that waited more than SOUND_STALE are dropped, a typewriter
+    blip that plays late is worse than a missing one.
+    """
+
+    def __init__(self):
+        self.commands = queue.SimpleQueue()  # (name, args, time sent), None ends the thread
+        self.failed = False  # no audio on this machine, commands are ignored
+        self.thread = None
+        # only the audio thread touches these
+        self.mixer = None
+        self.bank = None
+
+    def start(self):
+        """start the audio thread"""
+        self.thread = threading.Thread(target=self._run, name="audio", daemon=True)
+        self.thread.start()
+
+    def close(self):
+        """finish the commands already sent and end the thread (giving up on a stuck backend)"""
+        if self.thread:
+            self.commands.put(None)
+            self.thread.join(AUDIO_CLOSE_TIMEOUT)
+
+    # === commands (called from Tk) ===
+    def sound(self, path):
+        """play a sound effect"""
+        self._send("sound", path)
+
+    def play_music(self, path, loops=-1):
+        """load and play background music (-1 loops forever)"""
+        self._send("play_music", path, loops)
+
+    def pause(self):
+        self._send("pause")
+
+    def resume(self):
+        self._send("resume")
+
+    def volume(self, level):
+        """set music and sound effect volume, 0 to 1"""
+        self._send("volume", level)
+
+    def stop(self):
+        """stop the music and any sound effects playing"""
+        self._send("stop")
+
+    def _send(self, name, *args):
+        if not self.failed:
+            self.commands.put((name, args, time.monotonic()))
+
+    # === audio thread ===
+    def _run(self):
+        try:
+            import pygame  # slow on its own, which is why this runs in the background
+            pygame.mixer.init()
+            self.bank = SoundBank(pygame.mixer, SOUND_EFFECTS, SOUND_VOICES)
+            self.mixer = pygame.mixer
+        except Exception:  # no pygame, or no audio device
+            self.failed = True
+            return
+        while True:
+            command = self.commands.get()
+            if command is None:
+                return
+            name, args, sent = command
+            if name == "sound" and time.monotonic() - sent > SOUND_STALE:
+                continue  # too late to be in time with the text
+            try:
+                getattr(self, "_" + name)(*args)
+            except Exception:
+                pass  # a broken sound or music file shouldn't take the app down
+
+    def _sound(self, path):
+        if path not in self.bank.sounds:
+            self.bank.load(self.mixer, path)  # not in SOUND_EFFECTS, decoded the first time only
+        self.bank.play(path)
+
+    def _play_music(self, path, loops):
+        self.mixer.music.load(path)
+        self.mixer.music.play(loops)
+
+    def _pause(self):
+        self.mixer.music.pause()
+
+    def _resume(self):
+        self.mixer.music.unpause()
+
+    def _volume(self, level):
+        self.mixer.music.set_volume(level)
+        for voice in self.bank.voices:
+            voice.set_volume(level)
+
+    def _stop(self):
+        self.mixer.music.stop()
+        for voice in self.bank.voices:
+            voice.stop()
+
+
+# the audio used by the whole app
+audio = Audio()
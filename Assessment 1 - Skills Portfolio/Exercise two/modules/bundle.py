@@ -0,0 +1,219 @@
+"""precompiled asset bundle: every GIF frame and button image, already resized, in one file.
+
+Build it from the exercise folder with:
+
+    python -m modules.bundle
+
+At startup the bundle is memory-mapped and images are made straight from the mapped bytes,
+so nothing has to be decoded or resized. If any source asset changes the bundle is ignored
+and rebuilt in the background for the next launch.
+"""
+from PIL import Image, ImageSequence
+import hashlib
+import json
+import mmap
+import os
+import struct
+import subprocess
+import sys
+import time
+
+from modules.constants import BASE_DIR, BUNDLE_PATH, BUNDLE_VERSION, BUNDLE_GIFS, BUNDLE_IMAGES, BUNDLE_LOCK_TIMEOUT
+from modules.quality import TIERS, palette_of
+
+# file header: magic, where the index starts, how long the index is
+HEADER = struct.Struct("<8sQQ")
+MAGIC = b"GIFBNDL\0"
+# set while a bundle is being built (and inherited by anything the build starts), so loading
+# the out of date bundle from inside the build doesn't start yet another build
+BUILDING = "GIF_BUNDLE_BUILDING"
+
+
+def _relative(path):
+    """store paths relative to the exercise folder, so the folder can be moved"""
+    return os.path.relpath(path, BASE_DIR)
+
+
+def _key(kind, path, size):
+    width, height = size
+    return f"{kind}:{_relative(path)}:{width}x{height}"
+
+
+def _entries():
+    """keys of every entry the bundle should have, going by constants"""
+    keys = {_key("gif", path, size) for path, size in BUNDLE_GIFS.items()}
+    for path, size, gray in BUNDLE_IMAGES:
+        keys.add(_key("image", path, size))
+        if gray:
+            keys.add(_key("gray", path, size))
+    return keys
+
+
+def _fingerprint(path):
+    """mtime, size and hash of a source file, used to spot when it changes"""
+    stat = os.stat(path)
+    with open(path, "rb") as file:
+        digest = hashlib.sha1(file.read()).hexdigest()
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha1": digest}
+
+
+class Bundle:
+    """a memory-mapped bundle file"""
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.map)  # slicing this doesn't copy
+        magic, start, length = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an asset bundle")
+        self.index = json.loads(bytes(self.view[start:start + length]))
+
+    @classmethod
+    def load(cls, path=BUNDLE_PATH, rebuild=True):
+        """open the bundle if it matches the assets on disk, otherwise None.
+
+        An out of date bundle is rebuilt in the background (if rebuild is set), ready for the
+        next launch.
+        """
+        if not os.path.exists(path):
+            return None  # never built, see the top of this file
+        try:
+            bundle = cls(path)
+        except (OSError, ValueError):
+            return None  # unreadable (e.g. half written), carry on without it
+        if bundle.stale():
+            bundle.close()  # so the rebuild can replace the file (Windows won't replace a mapped file)
+            if rebuild:
+                rebuild_in_background()
+            return None
+        return bundle
+
+    def stale(self):
+        """whether the bundle was built from different assets (or an older format)"""
+        if self.index.get("version") != BUNDLE_VERSION:
+            return True
+        if _entries() != set(self.index["entries"]):
+            return True  # assets or sizes in constants changed
+        for relative, known in self.index["sources"].items():
+            path = os.path.join(BASE_DIR, relative)
+            if not os.path.exists(path):
+                return True
+            stat = os.stat(path)
+            if stat.st_mtime_ns == known["mtime_ns"] and stat.st_size == known["size"]:
+                continue  # unchanged, no need to hash it
+            if _fingerprint(path)["sha1"] != known["sha1"]:
+                return True  # touched and actually different
+        return False
+
+    def close(self):
+        self.view.release()
+        self.map.close()
+        self.file.close()
+
+    def frames(self, gif_path, size):
+        """the bundled frames of a GIF at size, or None if it isn't in the bundle"""
+        return self.index["entries"].get(_key("gif", gif_path, size))
+
+    def frame(self, entry, index):
+        """(image, duration, image_key) for one frame of a bundled GIF"""
+        start, duration, digest = entry["frames"][index]
+        image = self._image(entry, start)
+        return image, duration, (image.mode, image.size, bytes.fromhex(digest))
+
+    def image(self, path, size, gray=False):
+        """a bundled button image (or its grayscale version), or None if it isn't in the bundle"""
+        entry = self.index["entries"].get(_key("gray" if gray else "image", path, size))
+        return self._image(entry, entry["start"]) if entry else None
+
+    def _image(self, entry, start):
+        width, height = entry["size"]
+        length = width * height * len(entry["mode"])  # one byte per channel
+        # frombuffer uses the mapped bytes directly instead of copying them
+        image = Image.frombuffer(entry["mode"], (width, height), self.view[start:start + length], "raw", entry["mode"], 0, 1)
+        if entry["mode"] == "P":
+            image.putpalette(bytes(self.view[start + length:start + length + 768]))  # stored right after the pixels
+        return image
+
+
+def rebuild_in_background():
+    """start building a fresh bundle in a separate low priority process"""
+    nice = (lambda: os.nice(10)) if hasattr(os, "nice") else None  # don't slow the app down
+    subprocess.Popen([sys.executable, "-m", "modules.bundle"], cwd=BASE_DIR, preexec_fn=nice,
+                     env=dict(os.environ, **{BUILDING: "1"}), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def build(path=BUNDLE_PATH):
+    """decode and resize every asset listed in constants and write them all into one file"""
+    from modules.image_pool import image_key  # imported here, image_pool itself reads the bundle
+    lock = path + ".lock"
+    try:
+        if os.path.exists(lock) and time.time() - os.path.getmtime(lock) > BUNDLE_LOCK_TIMEOUT:
+            os.remove(lock)  # left behind by a build that crashed
+        os.close(os.open(lock, os.O_CREAT | os.O_EXCL))
+    except FileExistsError:
+        print("another build is already running")
+        return False
+
+    try:
+        index = {"version": BUNDLE_VERSION, "sources": {}, "entries": {}}
+        temp = path + ".tmp"
+        with open(temp, "wb") as out:
+            out.write(HEADER.pack(MAGIC, 0, 0))  # filled in at the end, once the index is known
+
+            def write(image):
+                start = out.tell()
+                out.write(image.tobytes())
+                if image.mode == "P":
+                    out.write(bytes(image.getpalette()).ljust(768, b"\0"))  # padded to all 256 colours
+                return start
+
+            for gif_path, size in BUNDLE_GIFS.items():
+                index["sources"][_relative(gif_path)] = _fingerprint(gif_path)
+                frames = []
+                gif = Image.open(gif_path)
+                palette = palette_of(gif)
+                for frame in ImageSequence.Iterator(gif):
+                    resized = TIERS[0].resize(frame, size, palette)  # best quality, kept as a palette image
+                    digest = image_key(resized)[2].hex()  # saves hashing each frame at startup
+                    frames.append([write(resized), frame.info.get("duration", 0), digest])
+                index["entries"][_key("gif", gif_path, size)] = {"mode": "P", "size": list(size), "frames": frames}
+                print(f"{_relative(gif_path)}: {len(frames)} frames")
+
+            for image_path, size, gray in BUNDLE_IMAGES:
+                index["sources"][_relative(image_path)] = _fingerprint(image_path)
+                resized = Image.open(image_path).resize(size, Image.LANCZOS)
+                if resized.mode not in ("RGB", "RGBA"):
+                    resized = resized.convert("RGBA")
+                index["entries"][_key("image", image_path, size)] = {"mode": resized.mode, "size": list(size), "start": write(resized)}
+                if gray:
+                    # disabled buttons are shown in grayscale
+                    grayed = resized.convert("L").convert("RGB")
+                    index["entries"][_key("gray", image_path, size)] = {"mode": "RGB", "size": list(size), "start": write(grayed)}
+                print(f"{_relative(image_path)}: {size[0]}x{size[1]}")
+
+            data = json.dumps(index).encode()
+            start = out.tell()
+            out.write(data)
+            out.seek(0)
+            out.write(HEADER.pack(MAGIC, start, len(data)))
+        os.replace(temp, path)  # swap in the finished file all at once
+        return True
+    except PermissionError:
+        print("the bundle is in use by a running app, try again after closing it")
+        return False
+    finally:
+        os.remove(lock)
+
+
+# the bundle used by the whole app (None when there isn't an up to date one)
+# (a build never starts another one, it's already making the bundle)
+bundle = Bundle.load(rebuild=__name__ != "__main__" and BUILDING not in os.environ)
+
+
+if __name__ == "__main__":
+    if bundle:
+        print("the bundle is already up to date")
+    else:
+        os.environ[BUILDING] = "1"  # build() imports image_pool, which loads this module again
+        build()
@@ -0,0 +1,112 @@
+class CanvasImage:
+    """a canvas image item that GIFPlayer can draw on just like a Label"""
+
+    def __init__(self, compositor, item):
+        self.compositor = compositor
+        self.item = item
+        self.image = None  # GIFPlayer keeps a reference here so the frame isn't garbage collected
+
+    def config(self, image):
+        self.compositor.set_image(self.item, image)
+
+
+class Compositor:
+    """draws a whole screen as items on one canvas instead of widgets stacked with place().
+
+    buttons are plain image items that are hit-tested here, and items are only touched when
+    something about them really changes, so Tk only repaints the areas that changed.
+    """
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.buttons = {}  # item -> [(x1, y1, x2, y2), callback or None when disabled]
+        self.images = {}  # item -> image it's showing
+        self.hovering = False  # whether the mouse is over a button
+        self.background_click = None  # called for clicks that miss every button
+        canvas.bind("<Button-1>", self.on_click)
+        canvas.bind("<Motion>", self.on_motion)
+
+    # === creating items (later items are drawn on top) ===
+    def image(self, x, y, image=None):
+        """image item with its top left corner at x, y"""
+        item = self.canvas.create_image(x, y, anchor="nw")
+        self.set_image(item, image)
+        return item
+
+    def box(self, x, y, width, height, color):
+        """filled rectangle, used behind text"""
+        return self.canvas.create_rectangle(x, y, x + width, y + height, fill=color, outline="")
+
+    def text(self, x, y, width, font, color):
+        """text item that wraps at width"""
+        return self.canvas.create_text(x, y, anchor="nw", width=width, font=font, fill=color, justify="left")
+
+    def button(self, x, y, width, height, image, callback=None):
+        """image that calls callback when clicked (no callback means disabled)"""
+        item = self.image(x, y, image)
+        self.buttons[item] = [(x, y, x + width, y + height), callback]
+        return item
+
+    # === changing items ===
+    def set_image(self, item, image):
+        """show a different image, skipping the redraw if it's the same one"""
+        if image is not None and self.images.get(item) is not image:
+            self.images[item] = image
+            self.canvas.itemconfig(item, image=image)
+
+    def set_text(self, item, text):
+        self.canvas.itemconfig(item, text=text)
+
+    def append_text(self, item, text):
+        """add text to the end of a text item without replacing what's there"""
+        self.canvas.insert(item, "end", text)
+
+    def set_callback(self, item, callback):
+        """change what a button does (None disables it)"""
+        self.buttons[item][1] = callback
+
+    def move(self, item, x, y, width=None, height=None):
+        """move an item's top left corner (and resize boxes / change text wrapping)"""
+        if self.canvas.type(item) == "rectangle":
+            self.canvas.coords(item, x, y, x + width, y + height)
+        else:
+            self.canvas.coords(item, x, y)
+            if width is not None:
+                self.canvas.itemconfig(item, width=width)
+
+    def place_above(self, item, other):
+        """draw item just above other"""
+        self.canvas.tag_raise(item, other)
+
+    def show(self, *items):
+        for item in items:
+            self.canvas.itemconfig(item, state="normal")
+
+    def hide(self, *items):
+        for item in items:
+            self.canvas.itemconfig(item, state="hidden")
+
+    # === hit-testing ===
+    def hit(self, x, y):
+        """the topmost button under x, y (or None)"""
+        for item in reversed(list(self.buttons)):
+            x1, y1, x2, y2 = self.buttons[item][0]
+            if x1 <= x < x2 and y1 <= y < y2:
+                return item
+        return None
+
+    def on_click(self, event):
+        item = self.hit(event.x, event.y)
+        if item is not None:
+            callback = self.buttons[item][1]
+            if callback:
+                callback()
+        elif self.background_click:
+            self.background_click()
+
+    def on_motion(self, event):
+        # hand cursor over buttons, only updated when it actually changes
+        hovering = self.hit(event.x, event.y) is not None
+        if hovering != self.hovering:
+            self.hovering = hovering
+            self.canvas.config(cursor="hand2" if hovering else "")
@@ -3,6 +3,10 @@ import os
 # === file Paths ===
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
 JOKES_FILE_PATH = os.path.join(BASE_DIR, "media", "randomJokes.txt")
+JOKES_INDEX_VERSION = 2  # bump when the joke index layout changes so old indexes get rebuilt
+JOKES_ORDER_PATH = os.path.join(BASE_DIR, "media", "joke_order.json")  # how far through the shuffled jokes we are
+JOKES_POLL_INTERVAL = 2  # seconds between checks for jokes added to the jokes file
+JOKES_CHUNK_SIZE = 32 * 1024 * 1024  # bytes per worker job when indexing a big corpus with python -m modules.jokes
 
 # background GIFs
 IDLE_GIF = os.path.join(BASE_DIR, "media", "sans_start.gif")
@@ -14,11 +18,35 @@ TELL_JOKE_IMG = os.path.join(BASE_DIR, "media", "tell_joke.png")
 PUNCHLINE_IMG = os.path.join(BASE_DIR, "media", "punchline.png")
 NEXT_JOKE_IMG = os.path.join(BASE_DIR, "media", "next_joke.png")
 QUIT_IMG = os.path.join(BASE_DIR, "media", "quit.png")
+BUNDLE_PATH = os.path.join(BASE_DIR, "media", "assets.bundle")  # built by python -m modules.bundle
 
 # === window Settings ===
 WINDOW_WIDTH = 960
 WINDOW_HEIGHT = 540
 WINDOW_TITLE = "sans. - Joke Teller"
+GIF_WINDOW_SIZE = 8  # frames kept in memory for a streamed GIF
+GIF_STREAM_THRESHOLD = 256 * 1024 * 1024  # GIFs needing more frame memory than this (bytes) are streamed
+GIF_LOADER_WORKERS = min(4, os.cpu_count() or 1)  # background threads resizing GIF frames
+GIF_POLL_INTERVAL = 15  # ms between checks for decoded frames
+GIF_CONVERT_BATCH = 4  # PhotoImages made per check while a GIF loads
+GIF_DEFAULT_DURATION = 100  # ms per frame if the GIF doesn't give one
+GIF_MIN_DURATION = 20  # faster delays than this fall back to the default
+SHARED_FRAMES = False  # opt in: share resized frames with other apps on this computer (held in RAM until the last app exits)
+SHARED_FRAMES_CHUNK = 16  # frames per shared memory block (about 8 MB at the window size)
+SHARED_FRAMES_VERSION = 3  # bump when the shared frame layout changes
+QUALITY_FRAME_BUDGET = 0.02  # seconds of resizing per frame for each loader thread
+QUALITY_COOLDOWN = 50  # resized frames between quality drops
+TELEMETRY_SAMPLES = 600  # timings kept per channel for percentiles
+TELEMETRY_LATE = 0.016  # seconds behind schedule (a 60 Hz frame) before a tick counts as late
+TELEMETRY_HUD_KEY = "<F3>"  # shows / hides the timing overlay
+TELEMETRY_HUD_INTERVAL = 0.5  # seconds between overlay updates
+TELEMETRY_DUMP_INTERVAL = 5  # seconds between JSON dumps (with --telemetry=path)
+
+# === clock ===
+CLOCK_SLACK = 0.004  # seconds, subscribers due this close together share a tick
+GIF_GROUP = "gif"  # clock group for the background GIFs
+TYPING_GROUP = "typing"  # clock group for the typewriter text
+TELEMETRY_GROUP = "telemetry"  # clock group for the timing overlay and dumps
 
 # music
 MUSIC_PATH = os.path.join(BASE_DIR, "media", "sans..mp3")
@@ -48,7 +76,7 @@ SANS_COMMENT_X = 655
 SANS_COMMENT_Y = 51
 SANS_COMMENT_WIDTH = 170
 SANS_COMMENT_HEIGHT = 165
-SANS_COMMENT_SPACING = 10
+SANS_COMMENT_PADDING = 10  # gap between the comment box edge and its text
 
 # === button positioning ===
 BUTTON_Y = 478
@@ -77,6 +105,10 @@ SANS_COMMENT_FONT_SIZE = 19
 # sound effects
 LETTER_SOUND_PATH = os.path.join(BASE_DIR, "media", "voice_sans.wav")
 TYPEWRITER_SPEED = 50  # milliseconds between characters
+SOUND_EFFECTS = [LETTER_SOUND_PATH]  # decoded once when the mixer starts, never read from disk again
+SOUND_VOICES = 3  # mixer channels kept for sound effects, the most that can play at once
+SOUND_STALE = 0.1  # seconds a sound effect may wait for the audio thread before it's dropped
+AUDIO_CLOSE_TIMEOUT = 1  # seconds quitting waits for the audio thread to stop the music
 
 # === colors ===
 BG_COLOR = "#000000"
@@ -84,4 +116,19 @@ DIALOGUE_TEXT_COLOR = "#000000"
 
 # === text content ===
 INITIAL_DIALOGUE_MESSAGE = "Sans looks like he's about to tell you a joke"
-SANS_COMMENT = 'You really should press that \n"tell me a joke" button, y\'know?'
\ No newline at end of file
+SANS_COMMENT = 'You really should press that \n"tell me a joke" button, y\'know?'
+
+# === asset bundle ===
+BUNDLE_VERSION = 2  # bump when the bundle layout changes so old bundles get rebuilt
+BUNDLE_LOCK_TIMEOUT = 600  # seconds before a leftover build lock counts as abandoned
+# every GIF and the size it's shown at
+BUNDLE_GIFS = {path: (WINDOW_WIDTH, WINDOW_HEIGHT) for path in (IDLE_GIF, SETUP_GIF, PUNCH_GIF)}
+# every button image: (path, size, whether it also needs a grayscale version)
+BUNDLE_IMAGES = [
+    (TELL_JOKE_IMG, (TELL_JOKE_WIDTH, TELL_JOKE_HEIGHT), True),
+    (PUNCHLINE_IMG, (PUNCHLINE_WIDTH, PUNCHLINE_HEIGHT), True),
+    (NEXT_JOKE_IMG, (NEXT_JOKE_WIDTH, NEXT_JOKE_HEIGHT), True),
+    (QUIT_IMG, (QUIT_WIDTH, QUIT_HEIGHT), False),
+    (UNMUTE_IMG, (MUTE_WIDTH, MUTE_HEIGHT), False),
+    (MUTE_IMG, (MUTE_WIDTH, MUTE_HEIGHT), False),
+]
\ No newline at end of file
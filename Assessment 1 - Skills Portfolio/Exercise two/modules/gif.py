@@ -1,46 +1,260 @@
-from PIL import Image, ImageTk, ImageSequence
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageTk
+import os
+import queue
+import threading
+import time
+
+from modules.bundle import bundle
+from modules.clock import clock
+from modules.constants import (GIF_WINDOW_SIZE, GIF_LOADER_WORKERS, GIF_POLL_INTERVAL, GIF_CONVERT_BATCH,
+                               GIF_DEFAULT_DURATION, GIF_MIN_DURATION, GIF_GROUP, GIF_STREAM_THRESHOLD,
+                               SHARED_FRAMES)
+from modules.image_pool import image_key, images
+from modules.quality import palette_of, quality, zoom
+from modules.shared_frames import SharedFrames
+from modules.telemetry import telemetry
+
+# resizing runs on these threads (each GIF decodes in order on a thread of its own), the Tk
+# thread only draws the frame on screen
+_loader = ThreadPoolExecutor(max_workers=GIF_LOADER_WORKERS, thread_name_prefix="gif-loader")
+
+
+class FrameWindow:
+    """decodes GIF frames in the background, keeping a window of them in memory.
+
+    frames are kept as palette images (a byte per pixel plus the palette), GIFPlayer only
+    expands the one it's showing to full colour.
+    """
+
+    def __init__(self, gif_path, width, height, size=None, shared=False):
+        self.size = (width, height)
+        # frames resized ahead of time in the asset bundle (None if it isn't there)
+        self.bundled = bundle.frames(gif_path, self.size) if bundle else None
+        if self.bundled:
+            self.image = None  # nothing to decode
+            self.palette = None
+            self.count = len(self.bundled["frames"])
+            self.shared = None  # the bundle is already as cheap as shared memory
+        else:
+            self.image = Image.open(gif_path)  # stays open so frames can be decoded later
+            self.count = getattr(self.image, "n_frames", 1)
+            self.palette = palette_of(self.image)  # resized frames go back onto the GIF's colours
+            # frames that other running apps already decoded
+            self.shared = SharedFrames.open(gif_path, self.count, width, height) if shared else None
+        # None keeps every frame
+        self.capacity = self.count if size is None else max(1, min(size, self.count))
+        self.frames = OrderedDict()  # frame index -> palette image, least recently used first
+        self.durations = [None] * self.count  # per-frame delay in ms, known once decoded
+        self.pending = set()  # requested frames that haven't arrived yet
+        self.ready = queue.Queue()  # resized frames coming back from the workers
+        self._wanted = deque()
+        self._lock = threading.Lock()
+        self._decoding = False
+        self._queued = threading.Semaphore(GIF_LOADER_WORKERS * 2)  # decoded frames waiting for a resize
+        images.holders.add(self)  # so the pool can count frames shared between windows
+
+    def __len__(self):
+        return self.count
+
+    def duration(self, index):
+        """seconds a frame stays on screen"""
+        ms = self.durations[index]
+        if not ms or ms < GIF_MIN_DURATION:
+            ms = GIF_DEFAULT_DURATION
+        return ms / 1000
+
+    def get(self, index):
+        """get a frame if it's decoded, otherwise request it and return None"""
+        self.receive()
+        frame = self.frames.get(index)
+        if frame is None:
+            self.request([index])
+        else:
+            self.frames.move_to_end(index)
+        return frame
+
+    def prefetch(self, index):
+        """request the frames coming up after index"""
+        self.request([(index + offset) % self.count for offset in range(1, self.capacity)])
+
+    def request(self, indexes):
+        """queue frames for decoding on a worker thread"""
+        indexes = [i for i in indexes if i not in self.frames and i not in self.pending]
+        if not indexes:
+            return
+        self.pending.update(indexes)
+        with self._lock:
+            self._wanted.extend(indexes)
+            if self._decoding:
+                return
+            self._decoding = True
+        # not on _loader, so resizing the first frame doesn't wait for the whole decode loop
+        threading.Thread(target=self._decode, name="gif-decode", daemon=True).start()
+
+    def receive(self, limit=None):
+        """collect resized frames from the workers (Tk thread only)"""
+        while limit is None or limit > 0:
+            try:
+                index, resized, duration, key = self.ready.get_nowait()
+            except queue.Empty:
+                break
+            self.pending.discard(index)
+            self.durations[index] = duration
+            self.frames[index] = images.share(resized, key)  # repeated frames share one image
+            if len(self.frames) > self.capacity:
+                self.frames.popitem(last=False)
+            if limit is not None:
+                limit -= 1
+
+    def _decode(self):
+        """decode wanted frames in order (own thread)"""
+        # each GIF frame builds on the previous one so this can't be split up
+        while True:
+            with self._lock:
+                if not self._wanted:
+                    self._decoding = False
+                    return
+                index = self._wanted.popleft()
+            if self.bundled:
+                # already decoded and resized, just wrap the bundled pixels
+                self.ready.put((index, *bundle.frame(self.bundled, index)))
+                continue
+            stored = self.shared.get(index, quality.tier) if self.shared else None
+            if stored:
+                image, duration = stored  # already resized by another app
+                self.ready.put((index, image, duration, image_key(image)))
+                continue
+            self.image.seek(index)
+            duration = self.image.info.get("duration")
+            self._queued.acquire()  # don't decode too far ahead of the resizing
+            try:
+                _loader.submit(self._resize, index, self.image.copy(), duration)
+            except RuntimeError:
+                return  # exiting, the workers already shut down
+
+    def _resize(self, index, frame, duration):
+        """resize a decoded frame and hand it to the Tk thread"""
+        try:
+            tier = quality.tier  # the filter depends on how fast this computer is
+            start = time.perf_counter()
+            resized = tier.resize(frame, self.size, self.palette)
+            quality.record(tier, time.perf_counter() - start)
+            if self.shared:
+                self.shared.put(index, resized, duration, tier)
+            self.ready.put((index, resized, duration, image_key(resized)))
+        finally:
+            self._queued.release()
 
 
 class GIFPlayer:
     """handles animated GIF playback on a label"""
-    _all_gifs = []
 
-    def __init__(self, label, gif_path, width, height):
+    def __init__(self, label, gif_path, width, height, stream=None, window=GIF_WINDOW_SIZE, shared=SHARED_FRAMES):
         self.label = label
-        self.frames = []
         self.current_frame = 0
-        self.job = None
+        self.deadline = None  # time.monotonic() when the current frame is due
+        self.waiting = False  # the last tick found its frame still decoding
+        self.job = None  # clock subscription
+        self.load_job = None
+        self.photo = None  # the one PhotoImage frames are drawn into
+        self.small = None  # half size tier frames go here first, then get zoomed into zoomed
+        self.zoomed = None
+        self.telemetry = telemetry.channel("gif " + os.path.basename(gif_path))
 
-        # load and resize all GIF frames
-        im = Image.open(gif_path)
-        for frame in ImageSequence.Iterator(im):
-            resized = frame.copy().resize((width, height), Image.LANCZOS)
-            self.frames.append(ImageTk.PhotoImage(resized))
+        self.frames = FrameWindow(gif_path, width, height, shared=shared)
+        if stream is None:
+            # only stream when every frame (a byte a pixel) together would be too big
+            stream = len(self.frames) * width * height > GIF_STREAM_THRESHOLD
+        self.stream = stream
+        if stream:
+            # frames are decoded while playing, memory stays the same for any GIF length
+            self.frames.capacity = max(1, min(window, len(self.frames)))
+        else:
+            # load every frame in the background, frame 0 first
+            self.frames.request(range(len(self.frames)))
+            self.load_job = clock.subscribe(self.load)
 
-        GIFPlayer._all_gifs.append(self)
+    def load(self, now):
+        """convert frames a few at a time while the GIF is loading"""
+        self.frames.receive(GIF_CONVERT_BATCH)
+        if not self.frames.pending:
+            self.load_job = None
+            return None
+        return now + GIF_POLL_INTERVAL / 1000
 
     def play(self):
         """start playing the GIF"""
         self.stop()
         self.current_frame = 0
-        self.animate()
+        self.deadline = time.monotonic()
+        self.waiting = False
+        self.telemetry.start()
+        self.job = clock.subscribe(self.animate, group=GIF_GROUP)
+
+    def animate(self, now):
+        """show the frame that's due, skipping frames we're late for"""
+        if self.waiting:
+            self.deadline = now  # a decode wait isn't lateness, the frame's time starts when it shows
+        else:
+            self.telemetry.drop(self.catch_up(now))
+
+        frame = self.frames.get(self.current_frame)
+        self.waiting = frame is None
+        if frame is None:
+            # not decoded yet, try again shortly
+            self.telemetry.stall()
+            return now + GIF_POLL_INTERVAL / 1000
+
+        self.telemetry.tick(self.deadline)  # when this frame was meant to show
+        drawn = time.perf_counter()
+        self.draw(frame)
+        self.telemetry.draw(time.perf_counter() - drawn)
+        if self.stream:
+            self.frames.prefetch(self.current_frame)
+
+        # next deadline counts from when this frame was due so lag doesn't build up
+        self.deadline += self.frames.duration(self.current_frame)
+        self.current_frame = (self.current_frame + 1) % len(self.frames)
+        return self.deadline
+
+    def draw(self, frame):
+        """expand a palette frame to full colour and paint it into the label's image"""
+        rgb = frame.convert("RGB")  # only the frame on screen is ever RGB
+        if rgb.width < self.frames.size[0]:
+            # resized smaller, Tk scales it up
+            self.small = self.paste(self.small, rgb)
+            self.zoomed = zoom(self.small, self.frames.size[0] // rgb.width, into=self.zoomed)
+            photo = self.zoomed
+        else:
+            photo = self.photo = self.paste(self.photo, rgb)
+        if getattr(self.label, "image", None) is not photo:
+            self.label.config(image=photo)  # after this, pasting a frame updates the label by itself
+            self.label.image = photo
+
+    @staticmethod
+    def paste(photo, image):
+        """paint image into photo, only making a new PhotoImage if there isn't one the right size"""
+        if photo is None or (photo.width(), photo.height()) != image.size:
+            return ImageTk.PhotoImage(image)
+        photo.paste(image)
+        return photo
 
-    def animate(self):
-        """show next frame"""
-        if self.frames:
-            self.label.config(image=self.frames[self.current_frame])
-            self.label.image = self.frames[self.current_frame]
+    def catch_up(self, now):
+        """skip frames whose time already passed, returns how many"""
+        for skipped in range(len(self.frames)):
+            duration = self.frames.duration(self.current_frame)
+            if now < self.deadline + duration:
+                return skipped
+            self.deadline += duration
             self.current_frame = (self.current_frame + 1) % len(self.frames)
-            self.job = self.label.after(100, self.animate)
+        # more than a whole loop behind, restart the clock
+        self.deadline = now
+        return len(self.frames)
 
     def stop(self):
         """stop the animation"""
         if self.job:
-            self.label.after_cancel(self.job)
-            self.job = None
-
-    @classmethod
-    def stop_all(cls):
-        """stop all GIF animations"""
-        for gif in cls._all_gifs:
-            gif.stop()
\ No newline at end of file
+            self.job.cancel()
+            self.job = None
\ No newline at end of file
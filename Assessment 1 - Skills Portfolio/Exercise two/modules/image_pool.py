@@ -0,0 +1,104 @@
+from collections import Counter
+from PIL import Image, ImageTk
+import hashlib
+import weakref
+
+from modules.bundle import bundle
+
+
+def image_key(image):
+    """fingerprint of an image's pixels (fine to call from a worker thread)"""
+    digest = hashlib.blake2b(image.tobytes(), digest_size=16)
+    if image.mode == "P":
+        digest.update(bytes(image.getpalette()))  # same indices in other colours is a different image
+    return image.mode, image.size, digest.digest()
+
+
+class ImagePool:
+    """shares one PhotoImage between identical frames and repeated image loads"""
+
+    def __init__(self):
+        # fingerprint -> PhotoImage, weak so frames a GIF dropped can still be freed
+        self.photos = weakref.WeakValueDictionary()
+        self.frames = weakref.WeakValueDictionary()  # fingerprint -> compact (palette) GIF frame
+        self.files = {}  # (path, size) -> PhotoImage
+        self.sources = {}  # path -> decoded image file
+        self.resized = {}  # (path, size) -> resized PIL image
+        self.handouts = Counter()  # fingerprint -> times its PhotoImage was handed out
+        self.holders = weakref.WeakSet()  # GIF frame windows holding frames from share()
+
+    def photo(self, image, key=None):
+        """PhotoImage for a PIL image, reusing one with exactly the same pixels"""
+        key = key or image_key(image)
+        photo = self.photos.get(key)
+        if photo is None:
+            photo = ImageTk.PhotoImage(image)
+            self.photos[key] = photo
+            self.handouts[key] = 0  # an older PhotoImage with these pixels may have been freed
+        self.handouts[key] += 1
+        return photo
+
+    def share(self, image, key=None):
+        """one shared copy of a PIL image, so identical GIF frames are only stored once"""
+        key = key or image_key(image)
+        shared = self.frames.get(key)
+        if shared is None:
+            self.frames[key] = shared = image
+        return shared
+
+    def open(self, path, size):
+        """open an image file resized to size (decoded once per file, resized once per size)"""
+        if (path, size) not in self.resized:
+            bundled = bundle.image(path, size) if bundle else None
+            if bundled:
+                self.resized[(path, size)] = bundled  # resized when the bundle was built
+                return bundled
+            if path not in self.sources:
+                self.sources[path] = Image.open(path)
+                self.sources[path].load()
+            self.resized[(path, size)] = self.sources[path].resize(size, Image.LANCZOS)
+        return self.resized[(path, size)]
+
+    def load(self, path, size):
+        """PhotoImage of an image file at size, reused if it was loaded before"""
+        # open() gives back the same resized image, so photo() finds the PhotoImage made first time
+        photo = self.photo(self.open(path, size))
+        self.files[(path, size)] = photo  # kept for the whole run
+        return photo
+
+    def gray(self, path, size):
+        """grayscale PhotoImage of an image file at size, for disabled buttons"""
+        image = bundle.image(path, size, gray=True) if bundle else None
+        if image is None:
+            image = self.open(path, size).convert('L').convert('RGB')
+        return self.photo(image)
+
+    def savings(self):
+        """(images in use right now that are reused ones, bytes that saves)"""
+        reused = saved = 0
+        # PhotoImages handed out more than once, photos only holds the live ones
+        for key, photo in list(self.photos.items()):
+            extra = self.handouts[key] - 1
+            reused += extra
+            saved += extra * photo.width() * photo.height() * 4  # Tk uses 4 bytes per pixel
+        # GIF frames standing in for identical frames the windows hold right now
+        held = Counter()
+        frames = {}
+        for window in list(self.holders):
+            for frame in window.frames.values():
+                held[id(frame)] += 1
+                frames[id(frame)] = frame
+        for ident, count in held.items():
+            frame = frames[ident]
+            reused += count - 1
+            saved += (count - 1) * frame.width * frame.height * len(frame.getbands())  # a byte per band
+        return reused, saved
+
+    def summary(self):
+        """one line saying how much memory the pool saved"""
+        reused, saved = self.savings()
+        return f"image pool: {reused} images reused, {saved / 1024 / 1024:.1f} MB saved"
+
+
+# the pool used by the whole app
+images = ImagePool()
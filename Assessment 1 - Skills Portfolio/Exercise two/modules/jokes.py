@@ -0,0 +1,405 @@
+"""the joke corpus: randomJokes.txt memory-mapped, with an index of where every joke starts.
+
+only the joke that gets picked is read and parsed, so startup time and memory don't grow with
+the number of jokes. the index is built the first time (and whenever the jokes file changes),
+saved next to it as randomJokes.txt.idx, and memory-mapped too on later launches. jokes added
+to the end of the file while the app runs are picked up by refresh(), indexing just the new part
+on a background thread.
+
+a huge corpus can be indexed ahead of time using every core, listing lines that aren't jokes:
+
+    python -m modules.jokes path/to/jokes.txt [--workers N]
+"""
+from array import array
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import json
+import mmap
+import os
+import random
+import struct
+import sys
+import threading
+import time
+
+from modules.constants import JOKES_FILE_PATH, JOKES_INDEX_VERSION, JOKES_CHUNK_SIZE
+
+# index file header: magic, version, size and mtime of the jokes file it was built from, joke count,
+# sha1 of the text it indexes (padded so the offsets after it stay 8 byte aligned)
+HEADER = struct.Struct("<8sQQQQ20s4x")
+# the offsets after the header are in this machine's byte order, so that's part of the magic
+MAGIC = b"JOKEIDX" + sys.byteorder[0].encode()
+MASK64 = (1 << 64) - 1
+ROUNDS = 4  # Feistel rounds in Shuffle's permutation
+MALFORMED_SHOWN = 20  # malformed lines printed by python -m modules.jokes, the rest are counted
+
+
+def parse(line):
+    """{'setup', 'punchline'} from one line of the jokes file, split after the first question mark"""
+    setup, punchline = line.decode("utf-8").split("?", 1)
+    return {'setup': setup.strip() + '?', 'punchline': punchline.strip()}
+
+
+def build_index(data, start=0):
+    """where each joke line in data from start on begins (blank lines and lines without a '?' aren't jokes)"""
+    return _scan(data, start, len(data))[0]
+
+
+def _scan(data, start, end):
+    """(joke offsets, line numbers of malformed lines, lines scanned) for the lines from start to end.
+
+    malformed lines have text but no '?' to split on, line numbers count from 0 at start.
+    """
+    offsets = array("Q")
+    malformed = array("Q")
+    line = 0
+    while start < end:
+        stop = data.find(b"\n", start, end)
+        if stop == -1:
+            stop = end  # last line without a newline
+        if data.find(b"?", start, stop) != -1:
+            offsets.append(start)
+        elif data[start:stop].strip():
+            malformed.append(line)
+        start = stop + 1
+        line += 1
+    return offsets, malformed, line
+
+
+def save_index(index_path, stamp, digest, offsets):
+    """write offsets as the index of a jokes file with this (size, mtime) stamp and sha1 digest"""
+    temp = index_path + ".tmp"
+    with open(temp, "wb") as file:
+        file.write(HEADER.pack(MAGIC, JOKES_INDEX_VERSION, *stamp, len(offsets), digest))
+        offsets.tofile(file)
+    os.replace(temp, index_path)  # so a half written index is never picked up
+
+
+def build(path, index_path=None, workers=None):
+    """index a jokes file with a process per core, returning (joke count, malformed line numbers).
+
+    the file is cut into chunks of about JOKES_CHUNK_SIZE that end on a newline, every chunk is
+    scanned by a worker process with the same rule as build_index, and the offsets are joined
+    and saved as the index Corpus maps. line numbers count from 1, like an editor's.
+    """
+    with open(path, "rb") as file:
+        stat = os.fstat(file.fileno())
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if stat.st_size else b""
+    chunks = []
+    start = 0
+    while start < len(data):
+        stop = data.find(b"\n", start + JOKES_CHUNK_SIZE)
+        stop = len(data) if stop == -1 else stop + 1
+        chunks.append((start, stop))
+        start = stop
+    if data:
+        data.close()
+
+    offsets = array("Q")
+    malformed = array("Q")
+    lines = 0
+    with ProcessPoolExecutor(workers) as pool:
+        results = pool.map(_scan_chunk, [path] * len(chunks), chunks)
+        digest = _digest(path)  # while the workers scan
+        # results come back in file order, so each chunk's line numbers carry on from the last
+        for chunk_offsets, chunk_malformed, chunk_lines in results:
+            offsets.extend(chunk_offsets)
+            malformed.extend(lines + line + 1 for line in chunk_malformed)
+            lines += chunk_lines
+    save_index(index_path or path + ".idx", (stat.st_size, stat.st_mtime_ns), digest, offsets)
+    return len(offsets), malformed
+
+
+def _scan_chunk(path, chunk):
+    """_scan for one chunk of a file, in a worker process (it maps the file itself, so only
+    the path is sent over)"""
+    with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        return _scan(data, *chunk)
+
+
+def _digest(path):
+    """sha1 of a whole file, read a chunk at a time"""
+    digest = hashlib.sha1()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(JOKES_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.digest()
+
+
+class Corpus:
+    """the jokes in a jokes file, each one read straight from the mapped file when it's asked for"""
+
+    def __init__(self, path, index_path=None):
+        self.path = path
+        self.index_path = index_path or path + ".idx"
+        self.file, self.data, self.stamp = self._open()
+        self.index = None  # the mapped index file, when a saved one is used
+        self.digest = None  # sha1 of the text the offsets were built from
+        self.checking = None  # thread working out the index of a changed file
+        self.checked = None  # what it found: (file, data, stamp, offsets, digest), or None
+        self.offsets = self._load_index()
+        if self.offsets is None:
+            self.offsets = build_index(self.data)
+            self.digest = hashlib.sha1(self.data).digest()
+            self._save_index()
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def joke(self, number):
+        """parse joke number (in file order), None if that line isn't a joke any more"""
+        start = self.offsets[number]
+        stop = self.data.find(b"\n", start)
+        try:
+            return parse(self.data[start:stop if stop != -1 else len(self.data)])
+        except (ValueError, IndexError):
+            return None  # the file changed under the index (or isn't utf-8), refresh() will catch up
+
+    def random(self):
+        """a random joke"""
+        return self.joke(random.randrange(len(self.offsets)))
+
+    def refresh(self):
+        """pick up changes to the jokes file, returning whether there were any.
+
+        a change is looked into on a background thread, since hashing and indexing a big corpus
+        would hold up the window; the jokes already loaded are used until it's done, and the
+        first call after that switches to the new index. when jokes were only added to the end,
+        just the new part is indexed, anything else (an edit or a deletion earlier on) rebuilds
+        the whole index.
+        """
+        if self.checking:
+            if self.checking.is_alive():
+                return False  # still at it, look again next time
+            checked, self.checked, self.checking = self.checked, None, None
+            if checked is None:
+                return False  # the file couldn't be read, the next call tries again
+            self.close()
+            self.file, self.data, self.stamp, self.offsets, self.digest = checked
+            return True
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return False  # being replaced right now, look again next time
+        if (stat.st_size, stat.st_mtime_ns) == self.stamp:
+            return False  # untouched, the usual case
+        self.checking = threading.Thread(target=self._check, name="jokes-refresh", daemon=True)
+        self.checking.start()
+        return False
+
+    def _check(self):
+        """index the changed jokes file on the refresh thread (nothing the Tk thread uses is touched)"""
+        try:
+            file, data, stamp = self._open()
+        except OSError:
+            return  # being replaced right now
+        old = self.stamp[0]
+        digest = None
+        if 0 < old < len(data):
+            # every old byte has to be unchanged (not compared with the old map, a file rewritten
+            # in place shows its new text through that too)
+            with memoryview(data) as view:
+                digest = hashlib.sha1(view[:old])  # no copy of the old text
+        if digest and digest.digest() == self.digest:
+            offsets = array("Q", self.offsets)  # a copy, the mapped index can't grow
+            start = old
+            if data[old - 1:old] != b"\n":
+                # the old last line had no newline, so the new text may carry on from it
+                start = data.rfind(b"\n", 0, old) + 1
+                if offsets and offsets[-1] >= start:
+                    offsets.pop()
+            offsets.extend(build_index(data, start))
+            with memoryview(data) as view:
+                digest.update(view[old:])
+        else:
+            offsets = build_index(data)
+            digest = hashlib.sha1(data)
+        try:
+            save_index(self.index_path, stamp, digest.digest(), offsets)
+        except OSError:
+            pass  # read-only folder, the index is just rebuilt next time
+        self.checked = file, data, stamp, offsets, digest.digest()
+
+    def close(self):
+        if self.checking:
+            self.checking.join()  # it may still be reading the current index
+            self.checking = None
+            if self.checked:
+                file, data = self.checked[:2]
+                if data:
+                    data.close()
+                file.close()
+                self.checked = None
+        if self.index:
+            self.offsets.release()
+            self.index.close()
+            self.index = None
+        if self.data:
+            self.data.close()
+        self.file.close()
+
+    def _open(self):
+        """(file, mapped contents, (size, mtime)) of the jokes file"""
+        file = open(self.path, "rb")
+        stat = os.fstat(file.fileno())
+        # an empty file can't be mapped, but then there's nothing to read anyway
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if stat.st_size else b""
+        return file, data, (stat.st_size, stat.st_mtime_ns)  # the stamp tells whether an index is for this file
+
+    def _load_index(self):
+        """the offsets from the saved index (without copying them), or None if it's missing or out of date"""
+        try:
+            with open(self.index_path, "rb") as file:
+                index = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None  # never built (or empty)
+        if len(index) < HEADER.size:
+            index.close()
+            return None
+        magic, version, size, mtime_ns, count, digest = HEADER.unpack_from(index, 0)
+        if (magic, version, (size, mtime_ns)) != (MAGIC, JOKES_INDEX_VERSION, self.stamp) \
+                or len(index) != HEADER.size + count * 8:
+            index.close()
+            return None  # another file, an older format, or half written
+        self.index = index
+        self.digest = digest
+        return memoryview(index)[HEADER.size:].cast("Q")
+
+    def _save_index(self):
+        """write the offsets next to the jokes file for the next launch"""
+        try:
+            save_index(self.index_path, self.stamp, self.digest, self.offsets)
+        except OSError:
+            pass  # read-only folder, the index is just rebuilt next time
+
+
+class Shuffle:
+    """hands out every number below count exactly once, in random order, then starts a new order.
+
+    the order is a permutation worked out on the fly (a Feistel network over the next power of
+    4 up, stepping again whenever it lands past the end), so only the seed and how far along it
+    is are kept, however many jokes there are. with a path that state is saved after every
+    number, so the order carries on where it left off next launch.
+
+    numbers added while an order is under way (jokes appended to the file) come after the rest
+    of it, in an order of their own, so nothing already handed out comes round again early.
+    """
+
+    def __init__(self, count, path=None):
+        self.path = path
+        self.count = count
+        # the order being walked covers numbers base to base + size (the rest is still to come)
+        self.base = self.size = self.seed = self.position = 0
+        if not (path and self._load()):
+            self._start(0)
+
+    def resize(self, count):
+        """switch to a new number of jokes, keeping the order if some were only added"""
+        if count == self.count:
+            return
+        grew = count > self.count
+        self.count = count
+        if not grew:
+            self._start(0)  # jokes were taken out, the old order means nothing
+        elif not self.size:
+            self._start(self.base)  # there were no jokes, now the new ones can start
+        if self.path:
+            self._save()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.position == self.size:
+            # this order is done, next come numbers added since it started (or a fresh round)
+            self._start(self.base + self.size if self.base + self.size < self.count else 0)
+            if not self.size:
+                raise StopIteration  # nothing to hand out
+        number = self.base + self.permute(self.position)
+        self.position += 1
+        if self.path:
+            self._save()
+        return number
+
+    def permute(self, number):
+        """where number goes in this order (counting from base)"""
+        number = self._feistel(number)
+        while number >= self.size:
+            number = self._feistel(number)  # past the end, walk on until it's back in range
+        return number
+
+    def _feistel(self, number):
+        mask = (1 << self.half) - 1
+        left, right = number >> self.half, number & mask
+        for key in self.keys:
+            left, right = right, left ^ (_mix(right ^ key) & mask)
+        return left << self.half | right
+
+    def _start(self, base):
+        """begin a new order over the numbers from base to count"""
+        self.base, self.size = base, self.count - base
+        self.seed = random.getrandbits(64)
+        self.position = 0
+        self._keys()
+
+    def _keys(self):
+        self.half = max(1, ((self.size - 1).bit_length() + 1) // 2)  # bits in each half of the block
+        keys = random.Random(self.seed)
+        self.keys = [keys.getrandbits(64) for _ in range(ROUNDS)]
+
+    def _load(self):
+        """carry on from the saved state, if it's for the same number of jokes"""
+        try:
+            with open(self.path) as file:
+                state = json.load(file)
+            base, size, position = int(state["base"]), int(state["size"]), int(state["position"])
+            if state["count"] != self.count or not (0 <= base and base + size <= self.count and 0 <= position <= size):
+                return False  # the jokes changed, so the old order means nothing
+            self.seed = int(state["seed"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return False  # never saved, or unreadable
+        self.base, self.size, self.position = base, size, position
+        self._keys()
+        return True
+
+    def _save(self):
+        temp = self.path + ".tmp"
+        state = {"count": self.count, "base": self.base, "size": self.size, "seed": self.seed, "position": self.position}
+        try:
+            with open(temp, "w") as file:
+                json.dump(state, file)
+            os.replace(temp, self.path)
+        except OSError:
+            pass  # can't save here, the order just won't carry over
+
+
+def _mix(number):
+    """scramble 64 bits (splitmix64's finaliser)"""
+    number = ((number ^ (number >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    number = ((number ^ (number >> 27)) * 0x94D049BB133111EB) & MASK64
+    return number ^ (number >> 31)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="index a jokes file using every core")
+    parser.add_argument("path", nargs="?", default=JOKES_FILE_PATH, help="jokes file (default: the app's)")
+    parser.add_argument("--workers", type=int, help="processes to use (default: one per core)")
+    args = parser.parse_args()
+    started = time.perf_counter()
+    count, malformed = build(args.path, workers=args.workers)
+    seconds = time.perf_counter() - started
+    if malformed:
+        # show the first few so they can be fixed, the rest are only counted
+        with open(args.path, "rb") as file:
+            shown = set(malformed[:MALFORMED_SHOWN])
+            for number, line in enumerate(file, 1):
+                if number in shown:
+                    print(f"line {number}: no '?' in {line.strip()[:80].decode('utf-8', 'replace')!r}", file=sys.stderr)
+                if number >= malformed[min(len(malformed), MALFORMED_SHOWN) - 1]:
+                    break
+        if len(malformed) > MALFORMED_SHOWN:
+            print(f"... and {len(malformed) - MALFORMED_SHOWN:,} more", file=sys.stderr)
+    size = os.path.getsize(args.path)
+    print(f"indexed {count:,} jokes ({len(malformed):,} malformed lines skipped) in {seconds:.2f}s, "
+          f"{size / 1e6 / seconds:,.1f} MB/s")
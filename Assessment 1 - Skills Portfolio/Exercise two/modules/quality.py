@@ -0,0 +1,108 @@
+from PIL import GifImagePlugin, Image
+import threading
+import time
+import tkinter as tk
+
+from modules.constants import GIF_LOADER_WORKERS, QUALITY_FRAME_BUDGET, QUALITY_COOLDOWN
+
+
+# keep GIF frames as palette indices (a byte per pixel) instead of Pillow expanding every
+# frame after the first to RGB, only frames with their own palette still get expanded
+GifImagePlugin.LOADING_STRATEGY = GifImagePlugin.LoadingStrategy.RGB_AFTER_DIFFERENT_PALETTE_ONLY
+
+
+def palette_of(image):
+    """palette image with a GIF's colours, for mapping resized frames back onto them"""
+    if image.mode != "P":
+        return image.convert("RGB").quantize()  # no palette of its own, make one up
+    palette = Image.new("P", (1, 1))
+    palette.putpalette(image.getpalette())
+    return palette
+
+
+class Tier:
+    """one way of resizing GIF frames"""
+
+    def __init__(self, name, resample, scale=1):
+        self.name = name
+        self.resample = resample  # PIL resampling filter
+        self.scale = scale  # made this many times smaller, Tk zooms it back up
+
+    def resize(self, image, size, palette):
+        """resize a frame for this tier as a palette image (may come out smaller than size, see zoom())"""
+        width, height = size
+        size = (width // self.scale, height // self.scale)
+        if self.resample == Image.NEAREST and image.mode == "P":
+            return image.resize(size, Image.NEAREST)  # only picks existing pixels so the palette still fits
+        # smoother filters blend colours, so map the result back onto the GIF's palette
+        resized = image.convert("RGB").resize(size, self.resample)
+        return resized.quantize(palette=palette, dither=Image.Dither.NONE)
+
+
+# best looking first, calibrate() drops any that aren't cheaper than the one above
+TIERS = [
+    Tier("lanczos", Image.LANCZOS),
+    Tier("bilinear", Image.BILINEAR),
+    Tier("nearest", Image.NEAREST),
+    Tier("half", Image.BILINEAR, scale=2),
+]
+
+
+def zoom(photo, factor, into=None):
+    """scale a PhotoImage up inside Tk, much cheaper than a full size PIL resize"""
+    # into reuses an earlier zoomed image instead of making a new one
+    big = into or tk.PhotoImage(width=photo.width() * factor, height=photo.height() * factor)
+    big.tk.call(big, "copy", str(photo), "-zoom", factor, factor)
+    return big
+
+
+class Quality:
+    """picks how nicely GIF frames get resized based on how fast this computer is"""
+
+    def __init__(self):
+        self.tiers = list(TIERS)  # tiers to step down through, best first
+        self.level = 0  # index into tiers
+        self.cost = None  # running average of a worker's resize time per frame (seconds)
+        self.cooldown = 0  # resizes before it may step down again
+        self._lock = threading.Lock()  # every loader thread records into this
+
+    @property
+    def tier(self):
+        return self.tiers[self.level]
+
+    def calibrate(self, gif_path, size):
+        """time one resize per tier and start at the best one that's fast enough"""
+        frame = Image.open(gif_path)
+        frame.load()
+        palette = palette_of(frame)
+        self.tiers, costs = [], []
+        for tier in TIERS:
+            start = time.perf_counter()
+            tier.resize(frame, size, palette)
+            cost = time.perf_counter() - start
+            # a tier that's no cheaper than the one above would only look worse
+            if not costs or cost < costs[-1]:
+                self.tiers.append(tier)
+                costs.append(cost)
+        # the loader resizes on several threads so each may take longer
+        budget = QUALITY_FRAME_BUDGET * GIF_LOADER_WORKERS
+        fast = [level for level, cost in enumerate(costs) if cost <= budget]
+        self.level = fast[0] if fast else len(self.tiers) - 1  # nothing was fast enough
+
+    def record(self, tier, seconds):
+        """record how long a worker took to resize a frame, stepping down a tier when it's too slow"""
+        with self._lock:
+            if tier is not self.tier:
+                return  # resized before the last step down
+            # moving average so a single slow frame doesn't change the tier
+            self.cost = seconds if self.cost is None else self.cost * 0.9 + seconds * 0.1
+            if self.cooldown:
+                self.cooldown -= 1
+            elif self.cost > QUALITY_FRAME_BUDGET * GIF_LOADER_WORKERS and self.level < len(self.tiers) - 1:
+                self.level += 1
+                self.cost = None
+                self.cooldown = QUALITY_COOLDOWN
+
+
+# the quality setting used by the whole app
+quality = Quality()
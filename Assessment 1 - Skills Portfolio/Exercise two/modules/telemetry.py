@@ -0,0 +1,153 @@
+"""frame timing telemetry: how far the GIFs and typewriters drift from their schedule.
+
+press F3 (TELEMETRY_HUD_KEY) in the app to show or hide a live overlay of the numbers, or run
+it with --telemetry=stats.json to have them written to that file every few seconds. both
+also say how much memory the image pool is saving.
+"""
+from collections import deque
+import json
+import sys
+import time
+
+from modules.clock import clock
+from modules.constants import (TELEMETRY_SAMPLES, TELEMETRY_LATE, TELEMETRY_HUD_KEY, TELEMETRY_HUD_INTERVAL,
+                               TELEMETRY_DUMP_INTERVAL, TELEMETRY_GROUP, WINDOW_WIDTH)
+from modules.image_pool import images
+
+FLAG = "--telemetry="
+
+
+def percentiles(samples):
+    """p50 / p95 / p99 / max of some timings, in milliseconds"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    pick = lambda p: ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000
+    return {"p50": pick(0.5), "p95": pick(0.95), "p99": pick(0.99), "max": ordered[-1] * 1000}
+
+
+class Channel:
+    """timings for one repeating job (a GIF, a typewriter...)"""
+
+    def __init__(self, name, interval=None):
+        self.name = name
+        self.interval = interval  # seconds between ticks for fixed rate jobs, None if ticks pass their due time
+        # only the latest samples are kept
+        self.jitter = deque(maxlen=TELEMETRY_SAMPLES)  # actual minus intended time between ticks
+        self.lateness = deque(maxlen=TELEMETRY_SAMPLES)  # how long after its due time each tick ran
+        self.draws = deque(maxlen=TELEMETRY_SAMPLES)  # time spent updating the canvas each tick
+        self.ticks = 0
+        self.late = 0  # ticks more than TELEMETRY_LATE behind
+        self.dropped = 0  # frames skipped to catch up
+        self.stalls = 0  # ticks where the frame wasn't decoded yet
+        self.last_due = None
+        self.last_time = None
+
+    def start(self):
+        """begin a new run (the gap since the last one isn't jitter)"""
+        self.last_due = self.last_time = None
+
+    def tick(self, due=None):
+        """note that the job ran, due is when it was meant to (worked out from interval if None)"""
+        now = time.monotonic()
+        if due is None:
+            due = now if self.last_due is None else self.last_due + self.interval
+        if self.last_due is not None:
+            self.jitter.append((now - self.last_time) - (due - self.last_due))
+        self.lateness.append(now - due)
+        if now - due > TELEMETRY_LATE:
+            self.late += 1
+        self.ticks += 1
+        self.last_due, self.last_time = due, now
+
+    def drop(self, count):
+        self.dropped += count
+
+    def stall(self):
+        self.stalls += 1
+
+    def draw(self, seconds):
+        """note how long a canvas update (set_image, set_text) took"""
+        self.draws.append(seconds)
+
+    def stats(self):
+        return {
+            "ticks": self.ticks,
+            "late": self.late,
+            "dropped": self.dropped,
+            "stalls": self.stalls,
+            "jitter_ms": percentiles([abs(j) for j in self.jitter]),
+            "lateness_ms": percentiles(self.lateness),
+            "draw_ms": percentiles(self.draws),
+        }
+
+
+class Telemetry:
+    """every channel, plus the overlay and the periodic JSON dump"""
+
+    def __init__(self, argv):
+        self.channels = {}  # name -> Channel
+        self.ui = None  # compositor the overlay is drawn with
+        self.hud = None  # (box, text) overlay items
+        self.refresh_job = None  # clock subscription updating the overlay while it's shown
+        self.dump_path = next((arg[len(FLAG):] for arg in argv if arg.startswith(FLAG)), None)
+
+    def channel(self, name, interval=None):
+        """the channel with this name, made the first time it's asked for"""
+        if name not in self.channels:
+            self.channels[name] = Channel(name, interval)
+        return self.channels[name]
+
+    def snapshot(self):
+        return {name: channel.stats() for name, channel in self.channels.items()}
+
+    def attach(self, root, ui):
+        """bind the overlay key and start dumping if the app was run with --telemetry="""
+        self.ui = ui
+        # made last so it's drawn over everything, hidden until the key is pressed
+        self.hud = (ui.box(0, 0, 0, 0, "#000000"), ui.text(4, 4, WINDOW_WIDTH - 8, ("Courier", 9), "#00FF00"))
+        ui.hide(*self.hud)
+        root.bind_all(TELEMETRY_HUD_KEY, lambda e: self.toggle())
+        if self.dump_path:
+            clock.every(TELEMETRY_DUMP_INTERVAL, self.dump, delay=TELEMETRY_DUMP_INTERVAL, group=TELEMETRY_GROUP)
+
+    def dump(self):
+        reused, saved = images.savings()
+        stats = dict(self.snapshot(), image_pool={"reused": reused, "bytes_saved": saved})
+        with open(self.dump_path, "w") as file:
+            json.dump(stats, file, indent=2)
+
+    def toggle(self):
+        """show or hide the overlay"""
+        if self.refresh_job:
+            self.refresh_job.cancel()
+            self.refresh_job = None
+            self.ui.hide(*self.hud)
+            return
+        self.ui.show(*self.hud)
+        self.refresh_job = clock.every(TELEMETRY_HUD_INTERVAL, self.refresh, group=TELEMETRY_GROUP)
+
+    def refresh(self):
+        box, text = self.hud
+        self.ui.set_text(text, self.report())
+        x1, y1, x2, y2 = self.ui.canvas.bbox(text)
+        self.ui.move(box, 0, 0, x2 + 4, y2 + 4)  # backdrop fits the text
+
+    def report(self):
+        """the numbers as text for the overlay"""
+        lines = []
+        for name, stats in self.snapshot().items():
+            jitter = stats["jitter_ms"] or {}
+            draw = stats["draw_ms"] or {}
+            lines.append(
+                f"{name:<16} ticks {stats['ticks']:>6}  late {stats['late']:>4}  dropped {stats['dropped']:>4}  "
+                f"stalls {stats['stalls']:>4}  jitter p50/p95/p99 {jitter.get('p50', 0):5.1f}/"
+                f"{jitter.get('p95', 0):5.1f}/{jitter.get('p99', 0):5.1f} ms  draw p95 {draw.get('p95', 0):5.2f} ms"
+            )
+        lines = lines or ["no timings yet"]
+        lines.append(images.summary())  # memory saved by sharing identical images
+        return "\n".join(lines)
+
+
+# the telemetry used by the whole app
+telemetry = Telemetry(sys.argv)
@@ -0,0 +1,136 @@
+import time
+
+from modules.clock import clock
+from modules.constants import TYPEWRITER_SPEED, TYPING_GROUP
+from modules.telemetry import telemetry
+
+
+def wrap(text, font, width):
+    """split text into the lines Tk would wrap it into at width (measured with font)"""
+    lines = []
+    for paragraph in text.split("\n"):
+        line = ""
+        for word in paragraph.split(" "):
+            candidate = f"{line} {word}" if line else word
+            if line and font.measure(candidate) > width:
+                lines.append(line)  # word doesn't fit, it starts the next line
+                line = word
+            else:
+                line = candidate
+        lines.append(line)
+    return lines
+
+
+class Typewriter:
+    """reveals text on the canvas at TYPEWRITER_SPEED per character, appending only what's new.
+
+    the text is wrapped into lines up front and every line gets its own canvas text item, so
+    each tick only adds to the end of one short line instead of replacing (and Tk re-laying
+    out) the whole text. words also don't jump to the next line halfway typed.
+
+    how much is shown comes from the time since typing started, not from counting ticks, so a
+    busy event loop can't slow the reveal down: a late tick shows every character that's due
+    in one go, and a text always finishes when it should. finish() shows the rest at once.
+    """
+
+    def __init__(self, ui, x, y, width, font, color, name):
+        self.ui = ui
+        self.x, self.y, self.width = x, y, width
+        self.font = font
+        self.color = color
+        self.items = [ui.text(x, y, 0, font, color)]  # one per line, more are made when a text needs them
+        self.hidden = False
+        self.telemetry = telemetry.channel("typing " + name)
+        # the text being typed
+        self.job = None  # clock subscription while typing
+        self.lines = []  # (item, line text)
+        self.total = 0  # characters in the text
+        self.shown = 0  # characters shown so far
+        self.row = self.column = 0  # where the next character goes
+        self.started = 0  # time.monotonic() the first character was due
+        self.on_char = self.done = None
+
+    def type(self, text, on_char=None, done=None):
+        """start typing text, calling on_char(new text) as characters appear and done() at the end"""
+        lines = wrap(text, self.font, self.width)
+        self.clear()
+        if len(self.items) < len(lines):
+            while len(self.items) < len(lines):
+                item = self.ui.text(self.x, self.y, 0, self.font, self.color)
+                self.ui.place_above(item, self.items[-1])  # keep the lines together in the stacking order
+                self.items.append(item)
+            self.move(self.x, self.y)
+            if self.hidden:
+                self.hide()
+        self.lines = list(zip(self.items, lines))
+        self.total = sum(len(line) for line in lines)
+        self.shown = self.row = self.column = 0
+        self.on_char, self.done = on_char, done
+        self.started = time.monotonic()
+        self.telemetry.start()
+        self.job = clock.subscribe(self.tick, group=TYPING_GROUP)
+        return self.job
+
+    def tick(self, now):
+        """show every character that's due by now, returning when the next one is"""
+        speed = TYPEWRITER_SPEED / 1000
+        due = min(self.total, int((now - self.started) / speed) + 1)
+        self.telemetry.tick(self.started + self.shown * speed)
+        if due > self.shown + 1:
+            self.telemetry.drop(due - self.shown - 1)  # characters that didn't get a tick of their own
+        new = self.reveal(due)
+        if new and self.on_char:
+            self.on_char(new)
+        if self.shown < self.total:
+            return self.started + self.shown * speed
+        if self.done:
+            self.done()
+        return None
+
+    def finish(self):
+        """show the rest of the text straight away (nothing happens if it isn't typing)"""
+        if self.job and self.job.active:
+            self.job.cancel()
+            self.reveal(self.total)
+            if self.done:
+                self.done()
+
+    def reveal(self, count):
+        """show the text up to count characters in, returning the part that's new"""
+        new = []
+        start = time.perf_counter()
+        while self.shown < count:
+            item, line = self.lines[self.row]
+            chunk = line[self.column:self.column + count - self.shown]
+            if chunk:
+                self.ui.append_text(item, chunk)  # one change per line, however many characters
+                new.append(chunk)
+                self.column += len(chunk)
+                self.shown += len(chunk)
+            if self.column == len(line) and self.row < len(self.lines) - 1:
+                self.row += 1
+                self.column = 0
+        if new:
+            self.telemetry.draw(time.perf_counter() - start)
+        return "".join(new)
+
+    def clear(self):
+        for item in self.items:
+            self.ui.set_text(item, "")
+
+    def move(self, x, y, width=None):
+        """move the text's top left corner (a new width applies from the next text typed)"""
+        self.x, self.y = x, y
+        if width is not None:
+            self.width = width
+        linespace = self.font.metrics("linespace")
+        for row, item in enumerate(self.items):
+            self.ui.move(item, x, y + row * linespace)
+
+    def show(self):
+        self.hidden = False
+        self.ui.show(*self.items)
+
+    def hide(self):
+        self.hidden = True
+        self.ui.hide(*self.items)
@@ -0,0 +1,114 @@
+"""Memory held by the jokes at 10k, 1M and 10M jokes: the old list of dicts against Corpus.
+
+    python benchmarks/bench_jokes.py                          10k, 1M and 10M jokes
+    python benchmarks/bench_jokes.py --sizes 10000 100000     other sizes
+
+Each structure is loaded in its own process from a generated jokes file, so one running out of
+memory (the list of dicts needs gigabytes at 10M) doesn't stop the others. "held" is the size of
+the Python objects a structure keeps (sys.getsizeof summed over all of them). Corpus also maps
+the jokes file and its saved index, shown as "mapped": the OS pages that in and out as needed.
+Not part of run.py, the 10M runs take minutes and need the disk space for a ~600 MB file.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import use_exercise
+
+SIZES = [10_000, 1_000_000, 10_000_000]
+KINDS = ["dicts", "Corpus (first run)", "Corpus (saved index)"]
+
+
+def load_dicts(path):
+    """The jokes the way Sans.load_jokes used to keep them, one dict per joke"""
+    jokes = []
+    with open(path, 'r', encoding='utf-8') as file:
+        for line in file:
+            line = line.strip()
+            parts = line.split('?', 1)
+            jokes.append({'setup': parts[0].strip() + '?', 'punchline': parts[1].strip()})
+    return jokes
+
+
+def measure(kind, path):
+    """Load the jokes one way, returning seconds taken and bytes held / mapped"""
+    from array import array
+    from modules.jokes import Corpus
+
+    start = time.perf_counter()
+    if kind == "dicts":
+        jokes = load_dicts(path)
+        seconds = time.perf_counter() - start
+        held = sys.getsizeof(jokes) + sum(sys.getsizeof(joke) + sys.getsizeof(joke['setup'])
+                                          + sys.getsizeof(joke['punchline']) for joke in jokes)
+        return seconds, held, 0
+
+    corpus = Corpus(path)
+    seconds = time.perf_counter() - start
+    held = sys.getsizeof(corpus) + sys.getsizeof(corpus.__dict__)
+    if isinstance(corpus.offsets, array):
+        held += sys.getsizeof(corpus.offsets)  # built this run, kept in memory
+    mapped = len(corpus.data) + (len(corpus.index) if corpus.index else 0)
+    corpus.close()
+    return seconds, held, mapped
+
+
+def write_jokes(path, count):
+    """A jokes file with count jokes, the shipped ones over and over"""
+    from modules.constants import JOKES_FILE_PATH
+
+    with open(JOKES_FILE_PATH, "rb") as file:
+        lines = [line.strip() + b"\n" for line in file if b"?" in line]
+    block = b"".join(lines)
+    with open(path, "wb") as file:
+        for _ in range(count // len(lines)):
+            file.write(block)
+        file.write(b"".join(lines[:count % len(lines)]))
+
+
+def run(kind, path):
+    """Measure in a fresh process, returning its numbers or why it failed"""
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), "--measure", kind, path],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        lines = result.stderr.strip().splitlines()
+        return lines[-1] if lines else f"killed (exit {result.returncode}), probably out of memory"
+    return json.loads(result.stdout)
+
+
+def mb(size):
+    return f"{size / 1e6:,.1f} MB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="numbers of jokes to try")
+    parser.add_argument("--measure", nargs=2, metavar=("KIND", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    use_exercise("Exercise two")
+
+    if args.measure:
+        seconds, held, mapped = measure(*args.measure)
+        print(json.dumps({"seconds": seconds, "held": held, "mapped": mapped}))
+        return
+
+    print(f"{'jokes':>12}  {'structure':<22}{'load':>10}{'held':>14}{'per joke':>12}{'mapped':>14}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "jokes.txt")
+            write_jokes(path, size)
+            for kind in KINDS:  # the first Corpus run saves the index the second one uses
+                numbers = run(kind, path)
+                if isinstance(numbers, str):
+                    print(f"{size:>12,}  {kind:<22}{numbers}")
+                    continue
+                print(f"{size:>12,}  {kind:<22}{numbers['seconds']:>9.2f}s{mb(numbers['held']):>14}"
+                      f"{numbers['held'] / size:>10.1f} B{mb(numbers['mapped']):>14}")
+
+
+if __name__ == "__main__":
+    main()
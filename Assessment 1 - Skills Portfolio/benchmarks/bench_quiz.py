@@ -0,0 +1,37 @@
+"""Benchmarks for the Maths Quiz (Exercise one); run through run.py, which compares them to the baselines"""
+import tkinter as tk
+
+from common import REPEAT, emit, gif_metrics, median_ms, startup_ms, use_exercise
+
+use_exercise("Exercise one")
+from modules.clock import clock
+from modules.constants import BUNDLE_GIFS, WINDOW_WIDTH, WINDOW_HEIGHT
+from modules.gif import GIFPlayer
+from modules.image_pool import images
+from modules.quality import quality
+from modules.quiz_logic import Difficulty, QuizLogic
+
+PROBLEMS = 10000  # problems generated per timing
+
+
+def main():
+    metrics = {}
+
+    for diff in Difficulty:
+        ms = median_ms(lambda: [QuizLogic.generate_problem(diff) for _ in range(PROBLEMS)])
+        metrics[f"quiz.generate_problem.{diff.name.lower()}_us"] = ms * 1000 / PROBLEMS
+
+    root = tk.Tk()
+    clock.attach(root)
+    # always the best tier, and never stepping down, so runs on the same machine are comparable
+    quality.level = 0
+    quality.cooldown = float("inf")
+    metrics.update(gif_metrics(root, GIFPlayer, images, BUNDLE_GIFS, WINDOW_WIDTH, WINDOW_HEIGHT))
+    root.destroy()
+
+    metrics["quiz.startup.first_paint_ms"] = startup_ms("Maths_quiz.py", repeat=REPEAT)
+    emit(metrics)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Benchmarks for the Sans joke teller (Exercise two); run through run.py, which compares them to the baselines"""
+import tkinter as tk
+
+from common import REPEAT, emit, empty_pool, gif_metrics, median_ms, startup_ms, use_exercise
+
+use_exercise("Exercise two")
+from modules.clock import clock
+from modules.constants import BUNDLE_GIFS, JOKES_FILE_PATH, WINDOW_WIDTH, WINDOW_HEIGHT
+from modules.gif import GIFPlayer
+from modules.image_pool import images
+from modules.jokes import Corpus
+from modules.quality import quality
+from Sans import SansJokeApp
+
+
+def forget_images(app):
+    """Drop every image the app and the pool hold, so load_images is timed from a cold start each run"""
+    for name in [name for name in vars(app) if name.startswith("img_")]:
+        delattr(app, name)
+    empty_pool(images)
+
+
+def main():
+    metrics = {}
+    root = tk.Tk()
+    clock.attach(root)
+
+    # a bare app object: load_images only sets attributes, the rest of startup isn't needed
+    app = SansJokeApp.__new__(SansJokeApp)
+    app.root = root
+    metrics["sans.load_images_ms"] = median_ms(app.load_images, setup=lambda: forget_images(app))
+    metrics["sans.load_jokes_ms"] = median_ms(lambda: Corpus(JOKES_FILE_PATH).close())  # map the file and its index
+
+    # always the best tier, and never stepping down, so runs on the same machine are comparable
+    quality.level = 0
+    quality.cooldown = float("inf")
+    metrics.update(gif_metrics(root, GIFPlayer, images, BUNDLE_GIFS, WINDOW_WIDTH, WINDOW_HEIGHT))
+    root.destroy()
+
+    metrics["sans.startup.first_paint_ms"] = startup_ms("Sans.py", repeat=REPEAT)
+    emit(metrics)
+
+
+if __name__ == "__main__":
+    main()
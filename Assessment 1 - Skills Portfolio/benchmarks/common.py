@@ -0,0 +1,130 @@
+"""Timing helpers shared by bench_quiz.py and bench_sans.py"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPEAT = 5  # runs per timing, the median is kept
+WARMUP_SECONDS = 1  # animation time before measuring, so the first draws aren't counted
+ANIMATE_SECONDS = 3  # animation time measured per GIF
+STARTUP_TIMEOUT = 60  # seconds to wait for an app to report its startup
+
+
+def use_exercise(folder):
+    """Make an exercise's modules importable (both exercises call their package 'modules')"""
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), folder)
+    sys.path.insert(0, path)
+    os.chdir(path)
+    return path
+
+
+def median_ms(function, repeat=REPEAT, setup=None):
+    """Median time of a call in milliseconds (setup runs untimed before each call)"""
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        function()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def run_for(root, seconds):
+    """Let Tk run (animations, decoding) for a while"""
+    root.after(int(seconds * 1000), root.quit)
+    root.mainloop()
+
+
+def empty_pool(images):
+    """Forget everything an image pool holds, so the next load starts cold"""
+    images.files.clear()
+    images.resized.clear()
+    images.sources.clear()
+    images.photos.clear()
+    images.frames.clear()
+    images.handouts.clear()
+
+
+def gif_metrics(root, GIFPlayer, images, gif_paths, width, height):
+    """Loading time and steady-state animation numbers for each GIF"""
+    import tkinter as tk
+
+    metrics = {}
+    label = tk.Label(root)
+    label.pack()
+    for path in gif_paths:
+        name = os.path.splitext(os.path.basename(path))[0]
+        players = []
+
+        def load():
+            # the player starts decoding every frame when it's made, timed until the last one is in
+            # (shared memory is off, so a previous run's frames can't make this one look faster)
+            player = GIFPlayer(label, path, width, height, stream=False, shared=False)
+            while player.load_job:
+                root.update()
+                time.sleep(0.001)  # leave the GIL to the decode and resize threads
+            players.append(player)
+
+        def forget():
+            players.clear()  # the last run's frames would otherwise be reused through the pool
+            empty_pool(images)
+
+        metrics[f"gif.{name}.load_ms"] = median_ms(load, setup=forget)
+
+        player = players[-1]  # already loaded, so the animation is measured without any decoding
+        player.play()
+        run_for(root, WARMUP_SECONDS)
+        channel = player.telemetry
+        ticks = channel.ticks
+        channel.draws.clear()
+        run_for(root, ANIMATE_SECONDS)
+        player.stop()
+
+        metrics[f"gif.{name}.fps"] = (channel.ticks - ticks) / ANIMATE_SECONDS
+        metrics[f"gif.{name}.draw_p95_ms"] = (channel.stats()["draw_ms"] or {}).get("p95", 0.0)
+    label.destroy()
+    return metrics
+
+
+def startup_ms(script, repeat=3):
+    """Median milliseconds from launching an app to its first paint.
+
+    The app is started with --profile-startup=<file>; it writes that file once Tk has drawn the
+    window and gone idle, then it's closed.
+    """
+    times = []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as folder:
+            report = os.path.join(folder, "startup.json")
+            start = time.perf_counter()
+            app = subprocess.Popen([sys.executable, script, f"--profile-startup={report}"],
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                while not _finished(report):
+                    if app.poll() is not None or time.perf_counter() - start > STARTUP_TIMEOUT:
+                        raise RuntimeError(f"{script} didn't finish starting up")
+                    time.sleep(0.005)
+                times.append((time.perf_counter() - start) * 1000)
+            finally:
+                app.kill()
+                app.wait()
+    return statistics.median(times)
+
+
+def _finished(report):
+    """Whether the startup report has been completely written"""
+    try:
+        with open(report) as file:
+            json.load(file)
+        return True
+    except (OSError, ValueError):
+        return False  # not there yet, or still being written
+
+
+def emit(metrics):
+    """Hand the results to run.py (it reads the last line of output)"""
+    print(json.dumps(metrics))
@@ -0,0 +1,110 @@
+"""Runs the benchmarks for both apps and compares them with the saved baselines.
+
+    python benchmarks/run.py                  compare against baselines.json (fails on a regression)
+    python benchmarks/run.py --update         save this run as the new baselines
+    python benchmarks/run.py --threshold 10   allow metrics to get at most 10% worse
+
+Needs no screen or sound card: without a DISPLAY it starts its own Xvfb, and pygame is given
+SDL's dummy audio driver. Baselines only make sense on the machine they were recorded on.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINES = os.path.join(HERE, "baselines.json")
+SUITES = ["bench_quiz.py", "bench_sans.py"]  # one process each, the exercises' modules would clash
+THRESHOLD = 20  # default % a metric may get worse before the run fails
+
+
+def higher_is_better(metric):
+    return metric.endswith("fps")  # gif.<name>.fps
+
+
+def start_xvfb():
+    """Start a virtual X server, returning (process, display)"""
+    xvfb = shutil.which("Xvfb")
+    if xvfb is None:
+        sys.exit("no DISPLAY set and Xvfb isn't installed")
+    # Xvfb picks a free display number and writes it to this pipe once it's ready
+    read, write = os.pipe()
+    server = subprocess.Popen([xvfb, "-displayfd", str(write), "-screen", "0", "1280x720x24", "-nolisten", "tcp"],
+                              pass_fds=[write], stderr=subprocess.DEVNULL)
+    os.close(write)
+    with os.fdopen(read) as pipe:
+        display = pipe.readline().strip()
+    if not display:
+        server.kill()
+        sys.exit("Xvfb failed to start")
+    return server, ":" + display
+
+
+def run_suites():
+    """Run every suite and gather their metrics"""
+    env = dict(os.environ, SDL_AUDIODRIVER="dummy")  # no audio device needed
+    server = None
+    if not env.get("DISPLAY"):
+        server, env["DISPLAY"] = start_xvfb()
+    try:
+        metrics = {}
+        for suite in SUITES:
+            print(f"running {suite}...", file=sys.stderr)
+            result = subprocess.run([sys.executable, os.path.join(HERE, suite)], env=env,
+                                    stdout=subprocess.PIPE, text=True, check=True)
+            suite_metrics = json.loads(result.stdout.strip().splitlines()[-1])
+            clashes = metrics.keys() & suite_metrics.keys()
+            if clashes:
+                sys.exit(f"{suite} reports metrics another suite already did: {', '.join(sorted(clashes))}")
+            metrics.update(suite_metrics)
+        return metrics
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+
+def compare(baselines, metrics, threshold):
+    """Print each metric next to its baseline and return the names of those that regressed"""
+    regressed = []
+    print(f"{'metric':<44}{'baseline':>12}{'now':>12}{'change':>10}")
+    for name, value in sorted(metrics.items()):
+        base = baselines.get(name)
+        if base is None:
+            print(f"{name:<44}{'-':>12}{value:>12.3f}{'new':>10}")
+            continue
+        change = (value - base) / base * 100 if base else 0.0
+        worse = -change if higher_is_better(name) else change
+        flag = "  REGRESSED" if worse > threshold else ""
+        if flag:
+            regressed.append(name)
+        print(f"{name:<44}{base:>12.3f}{value:>12.3f}{change:>+9.1f}%{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--update", action="store_true", help="save this run as the new baselines")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help=f"percent a metric may get worse before failing (default {THRESHOLD})")
+    parser.add_argument("--baselines", default=BASELINES, help="baseline file to compare against / update")
+    args = parser.parse_args()
+
+    metrics = run_suites()
+    if args.update or not os.path.exists(args.baselines):
+        with open(args.baselines, "w") as file:
+            json.dump(metrics, file, indent=2, sort_keys=True)
+        print(f"saved {len(metrics)} metrics to {args.baselines}")
+        return
+
+    with open(args.baselines) as file:
+        baselines = json.load(file)
+    regressed = compare(baselines, metrics, args.threshold)
+    if regressed:
+        sys.exit(f"{len(regressed)} metric(s) regressed by more than {args.threshold}%: {', '.join(regressed)}")
+
+
+if __name__ == "__main__":
+    main()